@@ -0,0 +1,53 @@
+# cold start of the dashboard pages: the top-level imports of new_app.py and second_page.py are run
+# in a fresh interpreter with -X importtime, which prints the cumulative time of every module
+# run from the repository root: python benchmarks/bench_dashboard_startup.py
+import ast
+import os
+import subprocess
+import sys
+from synthetic import ROOT
+
+PAGES = ['new_app.py', 'second_page.py']
+
+# imports listed per page, the interpreter startup modules stay below MIN_SECONDS
+TOP = 8
+MIN_SECONDS = 0.01
+
+
+def page_imports(page):
+    # the import statements of a page, without the streamlit calls rendering it
+    with open(os.path.join(ROOT, page)) as f:
+        tree = ast.parse(f.read())
+    return '\n'.join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def import_times(code):
+    # {module: cumulative microseconds} of the modules imported at top level by code
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # nested imports are indented further than the single space of the top level ones
+        if not name[1:].startswith(' '):
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    for page in PAGES:
+        code = page_imports(page)
+        runs = [import_times(code) for _ in range(3)]
+        totals = [sum(times.values()) for times in runs]
+        best = runs[totals.index(min(totals))]
+        print(f'{page:16s} imports {min(totals) / 1e6:6.2f} s')
+        for name, cumulative in sorted(best.items(), key=lambda item: -item[1])[:TOP]:
+            if cumulative < MIN_SECONDS * 1e6:
+                break
+            print(f'    {name:32s} {cumulative / 1e6:6.2f} s')
+
+
+if __name__ == '__main__':
+    main()
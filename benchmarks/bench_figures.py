@@ -0,0 +1,51 @@
+# resident memory across dashboard reruns: charts drawn with pyplot and never closed (how the pages
+# used to draw them) against the pooled figures of figures.py. every rerun draws one lag chart and
+# saves it like st.pyplot does, the legends are rendered once to png bytes
+# run from the repository root: python benchmarks/bench_figures.py
+import io
+import numpy as np
+import pandas as pd
+from synthetic import timeit
+from figures import figure_stats, pooled_figure, rss_bytes
+
+RERUNS = 300
+SERIES = pd.Series(np.random.default_rng(0).uniform(0, 500, 60), index=pd.date_range('2024-06-01', periods=60, freq='D'))
+
+
+def pyplot_chart():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    plt.figure(figsize=(20, 6))
+    plt.plot(SERIES.index, SERIES, label='Day 30', color='blue')
+    plt.legend()
+    plt.grid(True)
+    plt.gcf().savefig(io.BytesIO(), format='png', dpi=50)
+
+
+def pooled_chart():
+    with pooled_figure((20, 6)) as fig:
+        ax = fig.subplots()
+        ax.plot(SERIES.index, SERIES, label='Day 30', color='blue')
+        ax.legend()
+        ax.grid(True)
+        fig.savefig(io.BytesIO(), format='png', dpi=50)
+
+
+def reruns(chart):
+    chart()
+    before = rss_bytes()
+    seconds = timeit(lambda: [chart() for _ in range(RERUNS)], repeat=1)
+    return seconds, (rss_bytes() - before) / 2 ** 20
+
+
+def main():
+    # the pooled figures first, the unclosed pyplot figures would inflate the baseline
+    for label, chart in (('pooled figures', pooled_chart), ('pyplot, never closed', pyplot_chart)):
+        seconds, growth = reruns(chart)
+        print(f'{label:22s} {RERUNS} reruns {seconds:6.2f} s   rss growth {growth:8.1f} MB')
+    print(figure_stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# wall time of forecasting the seven pollutant models one after another (the notebook loop)
+# against forecast_all, which steps them side by side on a thread pool
+# the gain grows with the core count, on a single core both take about the same time
+# run from the repository root: python benchmarks/bench_forecast_engine.py [horizon]
+import sys
+import numpy as np
+import pandas as pd
+import torch
+from synthetic import timeit
+import inference
+
+
+def histories(seed=0):
+    # random hourly histories shaped like the update_<pollutant>.csv files
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-05-01', periods=inference.LOOKBACK, freq='h', name='date')
+    data = {}
+    for pollutant in inference.FORECAST_MODELS:
+        scaler = inference.registry.get(pollutant)[1]
+        # the fitted range of every location, X = (scaled - min) / scale at 0 and 1
+        low, high = -scaler.min_ / scaler.scale_, (1 - scaler.min_) / scaler.scale_
+        data[pollutant] = pd.DataFrame(rng.uniform(low, high, (len(index), scaler.n_features_in_)),
+                                       index=index, columns=scaler.feature_names_in_)
+    return data
+
+
+def notebook_loop(data, horizon):
+    # each model in turn, as in code_.ipynb
+    forecasts = {}
+    for pollutant in inference.FORECAST_MODELS:
+        model, scaler = inference.registry.get(pollutant)
+        current_sequence = torch.tensor(scaler.transform(data[pollutant]), dtype=torch.float32).unsqueeze(0)
+        forecasted_values = []
+        with torch.no_grad():
+            for _ in range(horizon):
+                prediction = model(current_sequence)
+                forecasted_values.append(prediction.cpu().numpy())
+                current_sequence = torch.cat((current_sequence[:, 1:, :], prediction.unsqueeze(1)), dim=1)
+        forecasts[pollutant] = scaler.inverse_transform(np.concatenate(forecasted_values, axis=0))
+    return forecasts
+
+
+def main(horizon=48):
+    inference.registry.warm(inference.FORECAST_MODELS)
+    data = histories()
+    print(f'{torch.get_num_threads()} threads, {len(data)} models, {horizon} steps')
+    sequential = timeit(lambda: notebook_loop(data, horizon), repeat=3)
+    engine = timeit(lambda: inference.forecast_all(horizon=horizon, data=data), repeat=3)
+    print(f'sequential loop  {sequential:8.2f} s')
+    print(f'forecast_all     {engine:8.2f} s   ({sequential / engine:.1f}x)')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,47 @@
+# mask-scan (what the window functions used to do) against the ForecastIndex binary search
+# run from the repository root: python benchmarks/bench_forecast_index.py
+import numpy as np
+import pandas as pd
+from synthetic import forecast_frame, timeit
+from forecast_store import POLLUTANTS, ForecastIndex
+
+
+def mask_window(forecasted_df, initial_time, final_time, district):
+    mask = (forecasted_df.index >= initial_time) & (forecasted_df.index <= final_time) & (forecasted_df['District'] == district)
+    return forecasted_df.loc[mask, POLLUTANTS]
+
+
+def mask_hour(forecasted_df, date_hour):
+    return forecasted_df.loc[forecasted_df.index == date_hour, POLLUTANTS]
+
+
+def main():
+    forecasted_df = forecast_frame(days=60)
+    # shuffling the rows, the csv is not guaranteed to be sorted
+    forecasted_df = forecasted_df.iloc[np.random.default_rng(1).permutation(len(forecasted_df))]
+    districts = sorted(forecasted_df['District'].unique())
+    initial_time = forecasted_df.index.min() + pd.Timedelta(hours=5)
+
+    build = timeit(lambda: ForecastIndex(forecasted_df), repeat=3)
+    index = ForecastIndex(forecasted_df)
+    print(f'{len(forecasted_df)} rows, {len(districts)} districts, index build {build * 1000:.1f} ms')
+
+    hours = pd.date_range(initial_time, periods=48, freq='h')
+    scan = timeit(lambda: [mask_hour(forecasted_df, h) for h in hours], repeat=3) / len(hours)
+    fast = timeit(lambda: [index.hour(h, POLLUTANTS) for h in hours], repeat=3) / len(hours)
+    print(f'hour slice        mask {scan * 1000:8.2f} ms   index {fast * 1000:6.3f} ms   x{scan / fast:.0f}')
+
+    for days in (14, 30, 60):
+        final_time = initial_time + pd.Timedelta(days=days)
+        # checking both paths return the same rows before timing them
+        for district in districts:
+            expected = mask_window(forecasted_df, initial_time, final_time, district).sort_index()
+            got = index.window(initial_time, final_time, district, POLLUTANTS)
+            assert np.allclose(np.sort(expected.values, axis=0), np.sort(got.values, axis=0))
+        scan = timeit(lambda: [mask_window(forecasted_df, initial_time, final_time, d) for d in districts], repeat=3)
+        fast = timeit(lambda: [index.window(initial_time, final_time, d, POLLUTANTS) for d in districts], repeat=3)
+        print(f'{days:2d}-day window x36 mask {scan * 1000:8.2f} ms   index {fast * 1000:6.3f} ms   x{scan / fast:.0f}')
+
+
+if __name__ == '__main__':
+    main()
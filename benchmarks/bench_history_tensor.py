@@ -0,0 +1,50 @@
+# model inputs of the seven pollutants: one pivot_table per pollutant against a single reshape
+# of the long history into the (hours, locations, pollutants) tensor
+# run from the repository root: python benchmarks/bench_history_tensor.py
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from synthetic import timeit
+from history_store import VARIABLES, append, load_tensor, reshape, write_tensor
+
+
+def long_history(days=90, locations=300, seed=0):
+    # hourly history in the long format of the store, one row per hour and location
+    hours = pd.date_range('2024-01-01', periods=days * 24, freq='h')
+    rng = np.random.default_rng(seed)
+    table = pd.DataFrame({
+        'Date': np.repeat(hours.values, locations),
+        'Location_id': np.tile(np.arange(1, locations + 1), len(hours)),
+    })
+    for variable in VARIABLES:
+        table[variable] = rng.uniform(0, 500, len(table)).astype('float32')
+    return table
+
+
+def main():
+    table = long_history()
+    ids = np.arange(1, 301)
+    pivots = timeit(lambda: [table.pivot_table(index='Date', columns='Location_id', values=variable)
+                             for variable in VARIABLES], repeat=3)
+    tensor = timeit(lambda: reshape(table, ids), repeat=3)
+    print(f'{len(table)} rows   7 pivot_tables {pivots * 1000:8.1f} ms   reshape {tensor * 1000:8.1f} ms   '
+          f'{pivots / tensor:5.1f}x')
+
+    reference = table.pivot_table(index='Date', columns='Location_id', values='pm2_5')
+    dense, _, _ = reshape(table, ids)
+    assert np.array_equal(reference.to_numpy(dtype='float32'), dense[:, :, VARIABLES.index('pm2_5')])
+
+    # a day missing from the store is NaN in the tensor, not zero pollution
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, 'history')
+        three_days = long_history(days=3, locations=4)
+        append(three_days[three_days['Date'].dt.day != 2], root)
+        tensor, hours, _ = load_tensor(write_tensor(os.path.join(directory, 'history_tensor.npy'), root,
+                                                    locations=np.arange(1, 5)))
+        gap = (hours >= '2024-01-02') & (hours < '2024-01-03')
+        assert len(hours) == 72 and np.isnan(tensor[gap]).all() and not np.isnan(tensor[~gap]).any()
+
+
+if __name__ == '__main__':
+    main()
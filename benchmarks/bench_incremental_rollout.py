@@ -0,0 +1,32 @@
+# time per forecast hour of the incremental rollout against the full recompute of every window,
+# and the largest difference between the two (checked against inference.INCREMENTAL_TOLERANCE)
+# run from the repository root: python benchmarks/bench_incremental_rollout.py [horizon]
+import sys
+import numpy as np
+import torch
+from synthetic import timeit
+import inference
+
+
+def main(horizon=inference.FORECAST_HORIZON):
+    inference.configure()
+    print(f'{torch.get_num_threads()} threads, {horizon} steps')
+    worst = 0
+    for pollutant in inference.FORECAST_MODELS:
+        model = inference.registry.get(pollutant)[0]
+        window = torch.rand(1, inference.LOOKBACK, model.conv1.in_channels, generator=torch.Generator().manual_seed(0))
+        with torch.inference_mode():
+            full = inference.rollout(model, window, horizon, incremental=False)
+            incremental = inference.rollout(model, window, horizon)
+            full_time = timeit(lambda: inference.rollout(model, window, horizon, incremental=False), repeat=3)
+            incremental_time = timeit(lambda: inference.rollout(model, window, horizon), repeat=3)
+        difference = float(np.abs(full - incremental).max())
+        worst = max(worst, difference)
+        print(f'{pollutant:18s} full {full_time / horizon * 1000:6.2f} ms/step   '
+              f'incremental {incremental_time / horizon * 1000:6.2f} ms/step   max diff {difference:.2e}')
+    if worst > inference.INCREMENTAL_TOLERANCE:
+        raise SystemExit(f'incremental rollout is off by {worst:.2e}, above {inference.INCREMENTAL_TOLERANCE:.0e}')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
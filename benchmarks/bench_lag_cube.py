@@ -0,0 +1,59 @@
+# the lag chart of all 36 districts: reading the four lag csv files for every district and
+# resampling them (how plot_aqi_for_district used to work) against one slice of the lag cube
+# run from the repository root: python benchmarks/bench_lag_cube.py
+import os
+import tempfile
+import warnings
+import numpy as np
+import pandas as pd
+from synthetic import ROOT, forecast_frame, timeit
+from lag_cube import LAG_SOURCES, district_lags, write_cube
+
+# first day of each synthetic source, the lag forecasts start later than the history
+STARTS = {'aqi_30_days_lag.csv': '2024-06-01', 'aqi_14_days_lag.csv': '2024-06-17',
+          'aqi_7_days_lag.csv': '2024-06-24', 'ready_historical.csv': '2024-06-01'}
+END = pd.Timestamp('2024-07-01')
+
+
+def write_sources(days=30):
+    for seed, source in enumerate(LAG_SOURCES):
+        frame = forecast_frame(days=days, start=STARTS[source], seed=seed)[['Aqi', 'District', 'Location_id']]
+        frame.rename_axis('date').to_csv(source)
+
+
+def legacy_lags(district_name):
+    daily = []
+    for source in LAG_SOURCES:
+        table = pd.read_csv(source)
+        district = table[table['District'] == district_name]
+        district['date'] = pd.to_datetime(district['date'])
+        district.set_index('date', inplace=True)
+        daily.append(district[['Aqi']].resample('D').max())
+    return [frame.loc[END - pd.Timedelta(days=30):END] for frame in daily]
+
+
+def cube_lags(district_name):
+    lags = district_lags(district_name, END - pd.Timedelta(days=30), END)
+    return [lags[[source]].rename(columns={source: 'Aqi'}) for source in LAG_SOURCES]
+
+
+def main():
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        write_sources()
+        districts = sorted(pd.read_csv(os.path.join(ROOT, 'Join.csv'))['district'].unique())
+        build = timeit(write_cube, repeat=1)
+        legacy = timeit(lambda: [legacy_lags(district) for district in districts], repeat=1)
+        cube = timeit(lambda: [cube_lags(district) for district in districts], repeat=3)
+        print(f'cube built in {build * 1000:7.1f} ms   {len(districts)} districts: four csv files '
+              f'{legacy * 1000:8.1f} ms   cube slices {cube * 1000:6.1f} ms   {legacy / cube:6.0f}x')
+
+        for old, new in zip(legacy_lags('Lahore'), cube_lags('Lahore')):
+            old, new = old['Aqi'].dropna(), new['Aqi'].dropna()
+            assert old.index.equals(new.index) and np.allclose(old.to_numpy(), new.to_numpy(), rtol=1e-6)
+        os.chdir(ROOT)
+
+
+if __name__ == '__main__':
+    main()
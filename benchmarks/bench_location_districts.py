@@ -0,0 +1,51 @@
+# district assignment of forecast rows: pandas merges on coordinates and Join.csv against one take
+# on the precomputed lookup, and the spatial join itself at the current and 10x the point count
+# run from the repository root: python benchmarks/bench_location_districts.py
+import os
+import numpy as np
+import pandas as pd
+from synthetic import ROOT, timeit
+import location_districts
+
+
+def grid(points, seed=0):
+    # a denser set of monitoring points, scattered around the current locations
+    locations = pd.read_csv(os.path.join(ROOT, 'locations.csv'))
+    rng = np.random.default_rng(seed)
+    around = rng.integers(0, len(locations), points)
+    return pd.DataFrame({
+        'id': np.arange(points),
+        'latitude': locations['latitude'].values[around] + rng.uniform(-0.1, 0.1, points),
+        'longitude': locations['longitude'].values[around] + rng.uniform(-0.1, 0.1, points),
+    })
+
+
+def main():
+    locations = pd.read_csv(os.path.join(ROOT, 'locations.csv'))
+    join = pd.read_csv(os.path.join(ROOT, 'Join.csv'))
+    location_districts.load_lookup()
+
+    # two weeks of hourly rows as collected: coordinates and location ids
+    hours = 14 * 24
+    rows = pd.DataFrame({
+        'latitude': np.tile(locations['latitude'].values, hours),
+        'longitude': np.tile(locations['longitude'].values, hours),
+        'location_id': np.tile(locations['id'].values, hours),
+    })
+
+    def merged():
+        found = rows.merge(locations, on=['latitude', 'longitude'], how='inner')
+        return found.merge(join[['id', 'district']], left_on='id', right_on='id', how='left')['district']
+
+    merge = timeit(merged)
+    take = timeit(lambda: location_districts.district_of(rows['location_id'].to_numpy()))
+    print(f'{len(rows)} rows   merge {merge * 1000:8.2f} ms   take {take * 1000:8.2f} ms   {merge / take:6.1f}x')
+
+    for points in (len(locations), 10 * len(locations)):
+        new = grid(points)
+        join_time = timeit(lambda: location_districts.spatial_join(new['latitude'], new['longitude']), repeat=3)
+        print(f'{points:6d} points   spatial join {join_time * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
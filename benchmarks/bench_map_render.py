@@ -0,0 +1,45 @@
+# HTML size and build time of the single-layer choropleth against one layer per district
+# read from the shapefiles (how create_colored_map used to work)
+# run from the repository root: python benchmarks/bench_map_render.py
+import os
+import folium
+import geopandas as gpd
+from synthetic import ROOT, timeit
+from district_geometry import district_names
+from map_render import create_colored_map
+
+PALETTE = ['#00E400', '#FFFF00', '#FF7E00', '#FF0000', '#8F3F97', '#7E0023']
+
+
+def legacy_colored_map(locations_colors):
+    m = folium.Map(location=[30.9709, 72.4826], zoom_start=7)
+    gdf_1 = gpd.read_file(os.path.join(ROOT, 'punjabaoi', 'aoi_punjab.shp'))
+    folium.GeoJson(data=gdf_1.to_json(), name='My Shapefile').add_to(m)
+
+    def style_function(color):
+        return {'fillColor': color, 'weight': 2, 'color': color, 'fillOpacity': 0.7, 'opacity': 1}
+
+    for location, color in locations_colors.items():
+        gdf = gpd.read_file(os.path.join(ROOT, 'district_by_name', f'{location}.shp'))
+        folium.GeoJson(
+            data=gdf.to_json(),
+            name=location,
+            style_function=lambda feature, color=color: style_function(color),
+            tooltip=folium.GeoJsonTooltip(fields=['district'], aliases=['District:']),
+            overlay=True
+        ).add_to(m)
+    return m
+
+
+def main():
+    colors = {name: PALETTE[i % len(PALETTE)] for i, name in enumerate(district_names())}
+    for label, build in (('per-district layers', legacy_colored_map), ('single layer', create_colored_map)):
+        build_time = timeit(lambda: build(colors), repeat=3)
+        m = build(colors)
+        render_time = timeit(lambda: m.get_root().render(), repeat=3)
+        html = m.get_root().render()
+        print(f'{label:20s} build {build_time * 1000:8.1f} ms   render {render_time * 1000:8.1f} ms   html {len(html) / 1e6:6.2f} MB')
+
+
+if __name__ == '__main__':
+    main()
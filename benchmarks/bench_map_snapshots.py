@@ -0,0 +1,64 @@
+# first map of a fresh dashboard process: colored live from the rollup and the shapefiles, against
+# the snapshot rendered when the forecast was published. a synthetic forecast is written to a
+# temporary directory, the snapshots are rendered there and each map is built in a new interpreter
+# run from the repository root: python benchmarks/bench_map_snapshots.py
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from synthetic import ROOT, forecast_frame
+from forecast_store import FORECAST_FILE
+from rollups import export_rollups
+from map_snapshots import VIEWS, render_snapshots, snapshot_root
+
+HOUR = '2024-06-03 05:00:00'
+
+LIVE = f'''
+import sys
+sys.path.insert(0, {ROOT!r})
+from rollups import district_hour
+from district_geometry import district_names
+from map_render import create_colored_map
+from map_snapshots import view_colors
+create_colored_map(view_colors('aqi', district_hour({HOUR!r}, ['Aqi']), district_names())).get_root().render()
+'''
+
+SNAPSHOT = f'''
+import sys
+sys.path.insert(0, {ROOT!r})
+from map_snapshots import snapshot_map
+snapshot_map('aqi', {HOUR!r}).get_root().render()
+'''
+
+
+def cold_start(code, cwd):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-W', 'ignore', '-c', code], cwd=cwd, check=True, capture_output=True)
+    return time.perf_counter() - started
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(folder, file)) for folder, _, files in os.walk(path) for file in files)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        forecast_frame(days=14).to_csv(FORECAST_FILE)
+        export_rollups([FORECAST_FILE])
+        started = time.perf_counter()
+        rendered = render_snapshots()
+        render_time = time.perf_counter() - started
+        hours = len(os.listdir(rendered)) - 1
+        print(f'rendered {hours} hours x {len(VIEWS)} views in {render_time:6.2f} s   '
+              f'{directory_size(snapshot_root()) / 1e6:6.2f} MB on disk')
+
+        live = min(cold_start(LIVE, directory) for _ in range(3))
+        snapshot = min(cold_start(SNAPSHOT, directory) for _ in range(3))
+        print(f'first map of a new process   live {live * 1000:7.1f} ms   snapshot {snapshot * 1000:7.1f} ms')
+        os.chdir(ROOT)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# latency and memory of the fp32, int8 and TorchScript variants of the pollutant models
+# memory is the resident set growth of a fresh process loading all the models of a variant
+# run from the repository root: python benchmarks/bench_model_variants.py
+import multiprocessing
+import resource
+import warnings
+import torch
+from synthetic import timeit
+import inference
+
+warnings.filterwarnings('ignore', category=DeprecationWarning)
+warnings.filterwarnings('ignore', category=FutureWarning)
+
+
+def rss_kb():
+    # current resident set size, from /proc on linux and the peak elsewhere
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize() // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def loaded_memory(variant):
+    # KB added by loading every model of a variant, measured in the child process
+    before = rss_kb()
+    models = [inference.load_variant(name, variant) for name in inference.MODELS]
+    with torch.inference_mode():
+        models[0](torch.rand(1, inference.LOOKBACK, 300))
+    return rss_kb() - before
+
+
+def main():
+    inference.configure()
+    window = torch.rand(1, inference.LOOKBACK, 300)
+    context = multiprocessing.get_context('spawn')
+    print(f'{torch.get_num_threads()} threads')
+    for variant in inference.VARIANTS:
+        model = inference.load_variant('pm_10', variant)
+        with torch.inference_mode():
+            forward = timeit(lambda: model(window), repeat=20)
+            step = timeit(lambda: inference.rollout(model, window, 24), repeat=3) / 24
+        with context.Pool(1) as pool:
+            memory = pool.apply(loaded_memory, (variant,))
+        print(f'{variant:7s} forward {forward * 1000:6.2f} ms   rollout {step * 1000:6.2f} ms/step   '
+              f'{len(inference.MODELS)} models {memory / 1024:7.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
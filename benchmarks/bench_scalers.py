@@ -0,0 +1,57 @@
+# loading and applying the pollutant scalers: the joblib pickles with scikit-learn against the
+# exported min/scale arrays. loading is timed in fresh processes so the imports are counted
+# run from the repository root: python benchmarks/bench_scalers.py
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+from synthetic import ROOT, timeit
+import scalers
+
+NAMES = ['aqi', 'carbon_monoxide', 'dust', 'nitrogen_dioxide', 'ozone', 'pm_10', 'pm_25', 'sulphur_dioxide']
+
+PICKLES = f'''
+import joblib
+for name in {NAMES}:
+    joblib.load(name + '_scaler.pkl')
+'''
+
+PARAMS = f'''
+import scalers
+for name in {NAMES}:
+    scalers.MinMaxParams.load(scalers.params_path(name))
+'''
+
+
+def cold_start(code):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
+    return time.perf_counter() - started
+
+
+def main():
+    scalers.export_scalers()
+    baseline = cold_start('import numpy')
+    pickles = min(cold_start(PICKLES) for _ in range(3)) - baseline
+    params = max(0.0, min(cold_start(PARAMS) for _ in range(3)) - baseline)
+    print(f'cold load of {len(NAMES)} scalers   joblib {pickles * 1000:7.1f} ms   npz {params * 1000:7.1f} ms')
+
+    import joblib
+    sklearn_scaler = joblib.load(f'{ROOT}/pm_10_scaler.pkl')
+    fast = scalers.load_params('pm_10')
+    window = pd.DataFrame(np.random.default_rng(0).uniform(0, 500, (300, 300)), columns=sklearn_scaler.feature_names_in_)
+    forecast = np.random.default_rng(1).random((336, 300), dtype=np.float32)
+    sklearn_time = timeit(lambda: (np.asarray(sklearn_scaler.transform(window), dtype=np.float32),
+                                   sklearn_scaler.inverse_transform(forecast.astype(np.float64))), repeat=50)
+    fast_time = timeit(lambda: (fast.transform(window, dtype=np.float32), fast.inverse_transform(forecast)), repeat=50)
+    in_place = timeit(lambda: (fast.transform_(window.to_numpy(dtype=np.float32, copy=True)),
+                               fast.inverse_transform_(forecast.copy())), repeat=50)
+    print(f'transform + inverse   sklearn {sklearn_time * 1000:6.2f} ms   params {fast_time * 1000:6.2f} ms   '
+          f'float32 in place {in_place * 1000:6.2f} ms')
+    assert np.array_equal(sklearn_scaler.inverse_transform(forecast.astype(np.float64)), fast.inverse_transform(forecast))
+    assert np.allclose(fast.inverse_transform_(forecast.copy()), fast.inverse_transform(forecast), rtol=1e-5)
+
+
+if __name__ == '__main__':
+    main()
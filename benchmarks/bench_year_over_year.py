@@ -0,0 +1,65 @@
+# "this year against last year" for all 36 districts: reading last_year_pollutant.csv and resampling
+# it for every district (how last_year_aggregate_pollutants used to work) against slices of the year
+# over year store, for one and for three prior years
+# run from the repository root: python benchmarks/bench_year_over_year.py
+import os
+import tempfile
+import warnings
+import numpy as np
+import pandas as pd
+from synthetic import ROOT, forecast_frame, timeit
+from forecast_store import FORECAST_FILE
+from year_over_year import HISTORY_FILE, write_store, year_over_year
+
+START = pd.Timestamp('2024-06-01')
+
+
+def write_tables():
+    forecast_frame(days=60, start=START).to_csv(FORECAST_FILE)
+    history = forecast_frame(days=120, start=START - pd.DateOffset(years=1) - pd.Timedelta(days=30), seed=1)
+    history.rename(columns={'Pm_10': 'Pm10', 'Pm_25': 'Pm2_5'}).rename_axis('Date').to_csv(HISTORY_FILE)
+
+
+def legacy_last_year(district):
+    table = pd.read_csv(HISTORY_FILE).set_index('Date')
+    table.index = pd.to_datetime(table.index)
+    initial_time = START - pd.Timedelta(days=366)
+    final_time = initial_time + pd.Timedelta(days=60)
+    filtered = table[(table.index >= initial_time) & (table.index <= final_time) & (table['District'] == district)]
+    return filtered.select_dtypes(include=['float64', 'int64']).resample('h').mean().drop(columns=['Location_id'])
+
+
+def main():
+    warnings.simplefilter('ignore')
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        write_tables()
+        districts = sorted(pd.read_csv(os.path.join(ROOT, 'Join.csv'))['district'].unique())
+        end = START + pd.Timedelta(days=60)
+        build = timeit(write_store, repeat=1)
+        legacy = timeit(lambda: [legacy_last_year(district) for district in districts], repeat=1)
+        one = timeit(lambda: [year_over_year(district, START, end) for district in districts], repeat=3)
+        three = timeit(lambda: [year_over_year(district, START, end, kind='delta', years_back=years)
+                                for district in districts for years in (1, 2, 3)], repeat=3)
+        print(f'store built in {build * 1000:7.1f} ms   {len(districts)} districts: full csv {legacy * 1000:8.1f} ms   '
+              f'store {one * 1000:6.1f} ms   deltas of 3 years {three * 1000:6.1f} ms')
+
+        # the store compares the same calendar hour, the old path was shifted by 366 days
+        aligned = year_over_year('Lahore', START, end)
+        expected = legacy_last_year('Lahore').rename(columns={'Pm10': 'Pm_10', 'Pm2_5': 'Pm_25'})
+        expected = expected.reindex(aligned.index)[aligned.columns]
+        assert np.allclose(expected.to_numpy(), aligned.to_numpy(), rtol=1e-5, equal_nan=True)
+
+        # the store keeps the whole 60 day dashboard window past a shorter forecast, without a delta there
+        forecast_frame(days=14, start=START).to_csv(FORECAST_FILE)
+        window = year_over_year('Lahore', START, end)
+        assert len(window) == 60 * 24 + 1 and window.notna().all().all()
+        assert np.array_equal(window.to_numpy(), aligned.to_numpy(), equal_nan=True)
+        delta = year_over_year('Lahore', START, end, kind='delta')
+        assert delta.loc[:START + pd.Timedelta(days=14) - pd.Timedelta(hours=1)].notna().all().all()
+        assert delta.loc[START + pd.Timedelta(days=14):].isna().all().all()
+        os.chdir(ROOT)
+
+
+if __name__ == '__main__':
+    main()
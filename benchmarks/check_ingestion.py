@@ -0,0 +1,54 @@
+# offline check of the Open-Meteo ingestion: the responses recorded in fixtures/openmeteo (four
+# locations in two coordinate batches, one day) are replayed by the stub server and ingested
+# into a temporary history store, then ingested again to check nothing is stored twice
+# run from the repository root: python benchmarks/check_ingestion.py
+import datetime
+import os
+import tempfile
+import pandas as pd
+from synthetic import ROOT
+import ingestion
+from history_store import KEY, VARIABLES, days, load_tensor, read_history
+from openmeteo_stub import ReplayServer
+
+FIXTURES = os.path.join(ROOT, 'fixtures', 'openmeteo')
+DAY = datetime.date(2024, 6, 1)
+
+
+def run(server, directory, locations):
+    return ingestion.ingest(url=server.url, date_file=os.path.join(directory, 'date.json'),
+                            today=DAY + datetime.timedelta(days=1), history_dir=os.path.join(directory, 'history'),
+                            workers=2, locations=locations, batch_size=2,
+                            tensor_file=os.path.join(directory, 'history_tensor.npy'))
+
+
+def main():
+    locations = pd.read_csv(os.path.join(FIXTURES, 'locations.csv'))
+    with tempfile.TemporaryDirectory() as directory, ReplayServer(os.path.join(FIXTURES, 'recordings')) as server:
+        date_file = os.path.join(directory, 'date.json')
+        history_dir = os.path.join(directory, 'history')
+        ingestion.write_watermark(DAY - datetime.timedelta(days=1), date_file)
+
+        # one partition for the day, every hour of every location once
+        written = run(server, directory, locations)
+        assert len(written) == 1 and days(history_dir) == [str(DAY)], (written, days(history_dir))
+        stored = read_history(root=history_dir)
+        assert len(stored) == 24 * len(locations) and not stored.duplicated(KEY).any()
+        assert sorted(stored['Location_id'].unique()) == sorted(locations['id'])
+
+        # the watermark moved to the collected day
+        assert ingestion.read_watermark(date_file) == (DAY, DAY + datetime.timedelta(days=ingestion.COLLECTION_INTERVAL))
+        tensor, hours, ids = load_tensor(os.path.join(directory, 'history_tensor.npy'))
+        assert tensor.shape == (24, len(locations), len(VARIABLES)) and hours[0] == pd.Timestamp(DAY)
+
+        # nothing left to collect, and a rewound watermark stores no duplicate hours
+        assert run(server, directory, locations) == []
+        ingestion.write_watermark(DAY - datetime.timedelta(days=1), date_file)
+        assert run(server, directory, locations) == []
+        assert len(read_history(root=history_dir)) == 24 * len(locations)
+        assert ingestion.read_watermark(date_file)[0] == DAY
+    print('ingestion check passed')
+
+
+if __name__ == '__main__':
+    main()
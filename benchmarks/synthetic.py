@@ -0,0 +1,38 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# the benchmarks import the dashboard modules from the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from forecast_store import POLLUTANTS
+
+
+def forecast_frame(days=60, start='2024-06-01 00:00:00', seed=0):
+    # a forecast shaped like forecasted_pollutant.csv: one row per hour and location,
+    # locations and districts are taken from Join.csv
+    locations = pd.read_csv(os.path.join(ROOT, 'Join.csv')).sort_values('id')
+    hours = pd.date_range(start, periods=days * 24, freq='h')
+    rng = np.random.default_rng(seed)
+    n = len(hours) * len(locations)
+    forecasted_df = pd.DataFrame(
+        {pollutant: rng.uniform(0, 500, n) for pollutant in POLLUTANTS},
+        index=pd.DatetimeIndex(np.repeat(hours.values, len(locations)), name='date'),
+    )
+    forecasted_df['Location_id'] = np.tile(locations['id'].values.astype(float), len(hours))
+    forecasted_df['District'] = np.tile(locations['district'].values, len(hours))
+    return forecasted_df[sorted(forecasted_df.columns)]
+
+
+def timeit(func, repeat=5):
+    # best wall time of a few runs, in seconds
+    import time
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
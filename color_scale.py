@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+
+
+# Define color ranges and values for each pollutant
+color_mapping = {
+    'Pm_10': [(0, 275, '#FFC080'), (276, 550, '#FFA07A'), (551, 825, '#FF9900'), (826, 1100, '#FF6600'), (1101, 1375, '#FF4400'), (1376, float('inf'), '#FF0000')],
+    'Pm_25': [(0, 65, '#FFC0CB'), (66, 130, '#FF69B4'), (131, 195, '#FF0033'), (196, 260, '#FF0000'), (261, 325, '#8B0A1A'), (326, float('inf'), '#660000')],
+    'Carbon_monoxide': [(0, 1300, '#ADD8E6'), (1301, 2600, '#87CEEB'), (2601, 3900, '#6495ED'), (3901, 5200, '#0000FF'), (5201, 6500, '#00008B'), (6501, float('inf'), '#00008B')],
+    'Dust': [(0, 625, '#C5C3C5'), (626, 1250, '#C5107A'), (1251, 1875, '#7A288A'), (1876, 2500, '#6c5ce7'), (2501, 3125, '#4B0082'), (3126, float('inf'), '#3B3F4E')],
+    'Sulphur_dioxide': [(0, 35, '#F5F5DC'), (36, 70, '#964B00'), (71, 105, '#8B4513'), (106, 140, '#663300'), (141, 175, '#4B2E2E'), (176, float('inf'), '#3B2E2E')],
+    'Nitrogen_dioxide': [(0, 30, '#F7D2C4'), (31, 60, '#FFC394'), (61, 90, '#FF9900'), (91, 120, '#FF6600'), (121, 150, '#FF4400'), (151, float('inf'), '#FF0000')],
+    'Ozone': [(0, 55, '#C7F464'), (56, 110, '#0097A7'), (111, 165, '#00BFFF'), (166, 220, '#008000'), (221, 275, '#00695C'), (276, float('inf'), '#000080')]
+}
+
+
+class ColorScale:
+    # a breakpoint table compiled into sorted arrays, class i covers (uppers[i - 1], uppers[i]]
+    # so values between two integer bounds (e.g. 275 < x < 276) fall into the upper class
+
+    def __init__(self, uppers, colors, labels, nan_code):
+        self.uppers = np.asarray(uppers, dtype='float64')
+        self.colors = np.asarray(colors)
+        self.labels = list(labels)
+        # class given to missing values
+        self.nan_code = nan_code
+        # colors can repeat within a table, the categorical keeps each of them once
+        self.categories = list(dict.fromkeys(colors))
+        self.category_codes = np.array([self.categories.index(color) for color in colors], dtype='int8')
+
+    @classmethod
+    def from_ranges(cls, ranges):
+        # compiling a color_mapping entry, values below the first range and missing values
+        # keep the first color like get_pollutant_color did
+        uppers = [upper for _, upper, _ in ranges[:-1]]
+        colors = [color for _, _, color in ranges]
+        labels = [f'{lower}-{upper}' if upper != float('inf') else f'>{lower}' for lower, upper, _ in ranges]
+        return cls(uppers, colors, labels, nan_code=0)
+
+    def codes(self, values):
+        # class of every value as int8 codes
+        values = np.asarray(values, dtype='float64')
+        codes = np.searchsorted(self.uppers, values, side='left').astype('int8')
+        codes[np.isnan(values)] = self.nan_code
+        return codes
+
+    def classify(self, values):
+        # colors of every value as a categorical, indexed like values when it is a Series
+        colors = pd.Categorical.from_codes(self.category_codes[self.codes(values)], categories=self.categories)
+        if isinstance(values, pd.Series):
+            return pd.Series(colors, index=values.index, name=values.name)
+        return colors
+
+    def color(self, value):
+        # color of a single value
+        return self.colors[self.codes([value])[0]]
+
+
+# AQI categories, the upper bound of each category is inclusive
+AQI_CATEGORIES = ['Good', 'Moderate', 'Unhealthy for sensitive groups', 'Unhealthy', 'Very Unhealthy', 'Hazardous']
+AQI_RANGES = ['0-50', '51-100', '101-150', '151-200', '201-300', '301-500']
+AQI_COLORS = ['#00E400', '#FFFF00', '#FF7E00', '#FF0000', '#8F3F97', '#7E0023']
+AQI_COLOR_NAMES = ['Green', 'Yellow', 'Orange', 'Red', 'Purple', 'Maroon']
+
+# missing AQI values end up in the last category, as with the old if/elif chain
+AQI_SCALE = ColorScale([50, 100, 150, 200, 300], AQI_COLORS, AQI_CATEGORIES, nan_code=len(AQI_COLORS) - 1)
+AQI_NAME_SCALE = ColorScale([50, 100, 150, 200, 300], AQI_COLOR_NAMES, AQI_CATEGORIES, nan_code=len(AQI_COLORS) - 1)
+
+# AQI ranking map, one color per district from the cleanest to the most polluted
+RANKING_COLORS = [
+    "#00FF00", "#19F719", "#32EF32", "#4BE74B", "#64DF64", "#7DD77D", "#96CF96", "#AFC7AF",
+    "#C8BFC8", "#E1B7E1", "#FF9FFF", "#FF99E5", "#FF92CC", "#FF8CB2", "#FF8699", "#FF7F80",
+    "#FF7966", "#FF734D", "#FF6C33", "#FF662A", "#FF6020", "#FF5917", "#FF5313", "#FF4C0F",
+    "#FF460B", "#FF4007", "#FF3A03", "#FF3300", "#FF2D00", "#FF2600", "#FF2000", "#FF1A00",
+    "#FF1400", "#FF0D00", "#FF0700", "#FF0000"
+]
+
+POLLUTANT_SCALES = {pollutant: ColorScale.from_ranges(ranges) for pollutant, ranges in color_mapping.items()}
+
+
+def pollutant_scale(pollutant):
+    if pollutant not in POLLUTANT_SCALES:
+        raise ValueError(f"Invalid pollutant name: {pollutant}")
+    return POLLUTANT_SCALES[pollutant]
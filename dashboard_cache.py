@@ -0,0 +1,89 @@
+import functools
+import threading
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from pytz import timezone
+from forecast_store import FORECAST_FILE, forecast_version
+
+
+# frames and figures are kept for an hour at most, the hour they were built for is part of their key anyway
+TTL = 3600
+MAX_ENTRIES = 512
+
+# maps and geometry are shared objects (cache_resource), fewer of them are kept
+RESOURCE_ENTRIES = 64
+
+# calls and misses of every cached function, hits are the difference
+_counts = {}
+_lock = threading.Lock()
+
+
+# getting the current date hour in pakistan
+def get_pakistan_time():
+    # getting the current date and time in Pakistan
+    now = datetime.now(timezone('Asia/Karachi'))
+    # returning it in this format '2021-09-01 00:00:00'
+    formatted_time = now.strftime('%Y-%m-%d %H:00:00')
+    return formatted_time
+
+
+def _count(name, field):
+    with _lock:
+        counts = _counts.setdefault(name, {'calls': 0, 'misses': 0})
+        counts[field] += 1
+
+
+def file_version(paths):
+    # version of every file a cached value is read from, missing files count as None
+    versions = []
+    for path in paths:
+        try:
+            versions.append(forecast_version(path))
+        except OSError:
+            versions.append(None)
+    return tuple(versions)
+
+
+def cached(kind='data', paths=(FORECAST_FILE,), hourly=True, ttl=TTL, max_entries=None):
+    # caching a dashboard function on (file versions, hour, arguments): a republished forecast or a
+    # new hour in Pakistan is a new key, so maps and frames roll over by themselves.
+    # kind 'data' (cache_data, copied on every hit) is for frames and figures, 'resource'
+    # (cache_resource, shared) for maps and geometry that are never changed by the caller
+    def decorator(func):
+        name = func.__name__
+        if kind == 'resource':
+            cache = st.cache_resource(ttl=ttl, max_entries=max_entries or RESOURCE_ENTRIES, show_spinner=False)
+        elif kind == 'data':
+            cache = st.cache_data(ttl=ttl, max_entries=max_entries or MAX_ENTRIES, show_spinner=False)
+        else:
+            raise ValueError(f"Invalid cache kind: {kind}")
+
+        def compute(version, hour, *args, **kwargs):
+            _count(name, 'misses')
+            return func(*args, **kwargs)
+
+        # streamlit keeps one cache per function module and name
+        compute.__module__ = func.__module__
+        compute.__qualname__ = func.__qualname__
+        compute = cache(compute)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            _count(name, 'calls')
+            hour = get_pakistan_time() if hourly else None
+            return compute(file_version(paths), hour, *args, **kwargs)
+
+        wrapper.clear = compute.clear
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    # hits and misses of every cached function since the server started
+    with _lock:
+        rows = {name: {'hits': counts['calls'] - counts['misses'], 'misses': counts['misses']}
+                for name, counts in _counts.items()}
+    stats = pd.DataFrame.from_dict(rows, orient='index', columns=['hits', 'misses'])
+    stats['hit_rate'] = stats['hits'] / (stats['hits'] + stats['misses']).where(lambda total: total > 0)
+    return stats.rename_axis('function').sort_index()
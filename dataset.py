@@ -0,0 +1,53 @@
+import numpy as np
+import torch
+from numpy.lib.stride_tricks import sliding_window_view
+from torch.utils.data import Dataset
+from models import LOOKBACK
+
+
+def scaled_buffer(scaler, data):
+    # scaled hourly history (hours x locations) as one float32 array
+    return np.ascontiguousarray(scaler.transform(data), dtype=np.float32)
+
+
+def create_sequences(data, lookback=LOOKBACK):
+    # inputs (N, lookback, locations) and targets (N, locations) of every window of data
+    # both are views of data, nothing is copied
+    data = np.asarray(data)
+    X = sliding_window_view(data[:-1], lookback, axis=0).transpose(0, 2, 1)
+    y = data[lookback:]
+    return X, y
+
+
+class SequenceDataset(Dataset):
+    # windows of an hourly history, sliced lazily from a single float32 tensor
+    # memory stays the size of the history, a DataLoader only copies the windows of a batch
+
+    def __init__(self, data, lookback=LOOKBACK, start=0, stop=None):
+        self.data = torch.as_tensor(np.asarray(data, dtype=np.float32))
+        self.lookback = lookback
+        # window targets used by this dataset, e.g. to split training and test hours
+        total = len(self.data) - lookback
+        self.start = start
+        self.stop = total if stop is None else min(stop, total)
+
+    def __len__(self):
+        return max(0, self.stop - self.start)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        i += self.start
+        return self.data[i:i + self.lookback], self.data[i + self.lookback]
+
+    def split(self, fraction):
+        # first fraction of the windows and the rest, sharing the same buffer
+        cut = self.start + int(len(self) * fraction)
+        return self._view(self.start, cut), self._view(cut, self.stop)
+
+    def _view(self, start, stop):
+        view = SequenceDataset.__new__(SequenceDataset)
+        view.data, view.lookback, view.start, view.stop = self.data, self.lookback, start, stop
+        return view
@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+import pandas as pd
+import shapely
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DISTRICT_DIR = os.path.join(ROOT, 'district_by_name')
+BOUNDARY_FILE = os.path.join(ROOT, 'punjabaoi', 'aoi_punjab.shp')
+
+# simplification tolerance in degrees (0.005 is roughly 500 m), 0 keeps the full geometry
+SIMPLIFY_TOLERANCE = 0.005
+
+# loaded geometry keyed by (kind, tolerance), built once per process and shared by every map
+_cache = {}
+_lock = threading.Lock()
+
+
+def _simplify(geometries, tolerance):
+    if tolerance <= 0:
+        return geometries
+    # simplifying the districts as one coverage keeps the shared borders identical, so neighbours
+    # still meet without gaps or overlaps
+    if hasattr(shapely, 'coverage_simplify'):
+        return shapely.coverage_simplify(geometries, tolerance)
+    return shapely.simplify(geometries, tolerance, preserve_topology=True)
+
+
+def load_districts(tolerance=SIMPLIFY_TOLERANCE):
+    # all district polygons in one GeoDataFrame, indexed by the shapefile name (e.g. Dera_Ghazi_Khan)
+    with _lock:
+        key = ('districts', tolerance)
+        if key not in _cache:
+            import geopandas as gpd
+            frames = []
+            for file in sorted(os.listdir(DISTRICT_DIR)):
+                if file.endswith('.shp'):
+                    gdf = gpd.read_file(os.path.join(DISTRICT_DIR, file))[['district', 'geometry']]
+                    gdf.index = [file.split('.')[0]] * len(gdf)
+                    frames.append(gdf)
+            districts = gpd.GeoDataFrame(pd.concat(frames), crs=frames[0].crs).to_crs('EPSG:4326')
+            districts['geometry'] = _simplify(districts.geometry.values, tolerance)
+            _cache[key] = districts
+        return _cache[key]
+
+
+def district_features(tolerance=SIMPLIFY_TOLERANCE):
+    # GeoJSON feature of every district keyed by shapefile name, serialized once
+    # the features are shared, callers copy them before changing anything
+    districts = load_districts(tolerance)
+    with _lock:
+        key = ('features', tolerance)
+        if key not in _cache:
+            collection = json.loads(districts.to_json(drop_id=True))
+            features = {}
+            for name, feature in zip(districts.index, collection['features']):
+                feature['id'] = name
+                features[name] = feature
+            _cache[key] = features
+        return _cache[key]
+
+
+def district_names():
+    # shapefile names of all districts
+    return list(district_features().keys())
+
+
+def boundary_geojson(tolerance=SIMPLIFY_TOLERANCE):
+    # outline of Punjab as a GeoJSON dict
+    with _lock:
+        key = ('boundary', tolerance)
+        if key not in _cache:
+            import geopandas as gpd
+            boundary = gpd.read_file(BOUNDARY_FILE).to_crs('EPSG:4326')[['geometry']]
+            if tolerance > 0:
+                boundary['geometry'] = boundary.geometry.simplify(tolerance, preserve_topology=True)
+            _cache[key] = json.loads(boundary.to_json(drop_id=True))
+        return _cache[key]
+
+
+def colored_feature_collection(colors, tolerance=SIMPLIFY_TOLERANCE, features=None):
+    # FeatureCollection of the districts in colors ({shapefile name: color}) with the color injected
+    # as a feature property, the geometry itself is shared with the cache (or with features passed in)
+    if features is None:
+        features = district_features(tolerance)
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'id': name,
+                'properties': {**features[name]['properties'], 'color': color},
+                'geometry': features[name]['geometry'],
+            }
+            for name, color in colors.items()
+        ],
+    }
@@ -0,0 +1,39 @@
+import numpy as np
+import torch
+from sklearn.metrics import mean_absolute_error, mean_squared_error
+from torch.utils.data import DataLoader
+from dataset import SequenceDataset, scaled_buffer
+from models import LOOKBACK
+
+
+# Evaluate the model on every window of data, batch by batch
+def evaluate_model(model, scaler, data, lookback=LOOKBACK, batch_size=64):
+    dataset = SequenceDataset(scaled_buffer(scaler, data), lookback)
+    predictions, actuals = [], []
+
+    model.eval()
+    with torch.inference_mode():
+        for inputs, targets in DataLoader(dataset, batch_size=batch_size, shuffle=False):
+            predictions.append(model(inputs).numpy())
+            actuals.append(targets.numpy())
+
+    # Inverse transform the predictions and actuals
+    predictions = scaler.inverse_transform(np.concatenate(predictions).astype(np.float64))
+    actuals = scaler.inverse_transform(np.concatenate(actuals).astype(np.float64))
+
+    return predictions, actuals
+
+
+# Calculate metrics and confidence intervals
+def calculate_metrics_and_intervals(predictions, actuals):
+    mae = mean_absolute_error(actuals, predictions)
+    rmse = np.sqrt(mean_squared_error(actuals, predictions))
+
+    errors = actuals - predictions
+    std_error = np.std(errors)
+    confidence_interval = 1.96 * std_error  # For a 95% confidence interval
+
+    lower_bound = predictions - confidence_interval
+    upper_bound = predictions + confidence_interval
+
+    return mae, rmse, lower_bound, upper_bound
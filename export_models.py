@@ -0,0 +1,78 @@
+import json
+import os
+import time
+import warnings
+import torch
+from evaluation import calculate_metrics_and_intervals, evaluate_model
+from inference import (MODEL_DIR, MODELS, VARIANT_REPORT, VARIANTS, build_variant, history, load_scaler, rollout,
+                       variant_path)
+from models import LOOKBACK
+
+# hours of collected history the variants are evaluated on
+EVALUATION_HOURS = 7 * 24
+
+# forecast hours timed per variant
+TIMED_STEPS = 24
+
+
+def time_per_step(model, window, steps=TIMED_STEPS):
+    # ms per forecast hour, after one warm-up rollout
+    with torch.inference_mode():
+        rollout(model, window, 2)
+        started = time.perf_counter()
+        rollout(model, window, steps)
+    return (time.perf_counter() - started) / steps * 1000
+
+
+def export_model(name, data=None):
+    # writing the int8 and TorchScript files of one model and measuring every variant
+    scaler = load_scaler(name)
+    if data is None:
+        data = history(name, LOOKBACK + EVALUATION_HOURS)
+    window = torch.tensor(scaler.transform(data.iloc[-LOOKBACK:]), dtype=torch.float32).unsqueeze(0)
+
+    report = {}
+    for variant in VARIANTS:
+        # quantize_dynamic and torch.jit warn about their deprecation on every call, only here
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            warnings.simplefilter('ignore', FutureWarning)
+            model = build_variant(name, variant)
+            if variant == 'fp32':
+                path = os.path.join(MODEL_DIR, f'{name}_model_state.pt')
+            else:
+                path = variant_path(name, variant)
+                torch.jit.save(model if variant == 'script' else torch.jit.script(model), path)
+        predictions, actuals = evaluate_model(model, scaler, data, LOOKBACK)
+        mae, rmse, _, _ = calculate_metrics_and_intervals(predictions, actuals)
+        report[variant] = {
+            'mae': float(mae),
+            'rmse': float(rmse),
+            'ms_per_step': time_per_step(model, window),
+            'bytes': os.path.getsize(path),
+        }
+    for variant in VARIANTS:
+        report[variant]['mae_delta'] = report[variant]['mae'] - report['fp32']['mae']
+        report[variant]['rmse_delta'] = report[variant]['rmse'] - report['fp32']['rmse']
+    return report
+
+
+def export_variants(names=None):
+    # exporting every model and saving the report inference.select_variant reads
+    report = {}
+    if os.path.exists(VARIANT_REPORT):
+        with open(VARIANT_REPORT) as f:
+            report = json.load(f)
+    for name in names or MODELS:
+        report[name] = export_model(name)
+        for variant, row in report[name].items():
+            print(f'{name:18s} {variant:7s} MAE {row["mae"]:9.4f} ({row["mae_delta"]:+.4f})   '
+                  f'RMSE {row["rmse"]:9.4f} ({row["rmse_delta"]:+.4f})   '
+                  f'{row["ms_per_step"]:6.2f} ms/step   {row["bytes"] / 1024:6.0f} KB')
+    with open(VARIANT_REPORT, 'w') as f:
+        json.dump(report, f, indent=1)
+    return report
+
+
+if __name__ == '__main__':
+    export_variants()
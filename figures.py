@@ -0,0 +1,79 @@
+import io
+import os
+import threading
+from contextlib import contextmanager
+
+
+# matplotlib figures of the dashboard are made here, without pyplot: pyplot keeps every figure
+# it creates until it is closed, which in a long running server grows with every rerun.
+# static legends are rendered once to png bytes, charts borrow a figure from a small pool and
+# give it back cleared, so the number of live figures stays at POOL_SIZE
+POOL_SIZE = 4
+DPI = 100
+
+# legends are saved at the resolution st.pyplot uses
+PNG_DPI = 200
+
+_pool = []
+_lock = threading.Lock()
+_counts = {'created': 0, 'borrowed': 0}
+
+
+def new_figure(figsize):
+    # a figure drawn with the Agg canvas, independent of the pyplot backend
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=figsize, dpi=DPI)
+    FigureCanvasAgg(fig)
+    with _lock:
+        _counts['created'] += 1
+    return fig
+
+
+@contextmanager
+def pooled_figure(figsize):
+    # a cleared figure of the given size, returned to the pool when the block ends (also on errors)
+    with _lock:
+        fig = _pool.pop() if _pool else None
+        _counts['borrowed'] += 1
+    if fig is None:
+        fig = new_figure(figsize)
+    else:
+        fig.set_size_inches(figsize)
+    try:
+        yield fig
+    finally:
+        fig.clear()
+        with _lock:
+            if len(_pool) < POOL_SIZE:
+                _pool.append(fig)
+
+
+def render_png(fig, dpi=PNG_DPI):
+    # png bytes of a figure, cropped to what was drawn like st.pyplot does
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def rss_bytes():
+    # resident memory of this process, the peak is reported where /proc is missing
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+def figure_stats():
+    # figures made and borrowed since the server started, the pooled ones and the process memory
+    import sys
+    pyplot = sys.modules.get('matplotlib.pyplot')
+    with _lock:
+        stats = dict(_counts, pooled=len(_pool))
+    stats['pyplot_open'] = len(pyplot.get_fignums()) if pyplot is not None else 0
+    stats['rss_mb'] = round(rss_bytes() / 2 ** 20, 1)
+    return stats
@@ -0,0 +1,181 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader
+from dataset import SequenceDataset, scaled_buffer
+from inference import FORECAST_MODELS, MODEL_DIR, load_model, load_scaler, model_name, read_training, registry
+from models import LOOKBACK
+
+
+# Device configuration
+device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+# share of the new windows kept aside to measure the validation loss
+VALIDATION_FRACTION = 0.1
+
+# epochs without a better validation loss before a run stops
+PATIENCE = 2
+
+
+def checkpoint_path(name):
+    return os.path.join(MODEL_DIR, f'{name}_model_state.pt')
+
+
+def resume_path(name):
+    # state of an unfinished run, removed once the run completes
+    return os.path.join(MODEL_DIR, f'{name}_finetune_checkpoint.pt')
+
+
+def run_settings(data, lookback, epochs, patience, validation):
+    # what a resumed run must share with the interrupted one: the hours and content of the training
+    # data and the settings that decide how many epochs run
+    hours = (str(data.index[0]), str(data.index[-1])) if len(data) else (None, None)
+    digest = int(pd.util.hash_pandas_object(data, index=True).sum())
+    return {'hours': hours, 'shape': tuple(data.shape), 'hash': digest, 'lookback': lookback,
+            'epochs': epochs, 'patience': patience, 'validation': validation}
+
+
+def validation_loss(model, loader, criterion):
+    model.eval()
+    total, count = 0.0, 0
+    with torch.inference_mode():
+        for inputs, targets in loader:
+            inputs, targets = inputs.to(device), targets.to(device)
+            total += criterion(model(inputs), targets).item() * len(inputs)
+            count += len(inputs)
+    return total / count if count else float('nan')
+
+
+# Fine-tune pollutant model function
+def fine_tune_pollutant_model(pollutant, lookback=LOOKBACK, epochs=2, data=None, patience=PATIENCE,
+                              validation=VALIDATION_FRACTION, resume=True):
+    name = model_name(pollutant)
+    started = time.perf_counter()
+
+    # display the pollutant
+    print(f'Fine-tuning {name} model')
+    # Load model, scaler, and new data
+    model, scaler = load_model(name, map_location=device), load_scaler(name)
+    if data is None:
+        data = read_training(name)
+
+    # windows of the new data, sliced from one float32 buffer as they are used
+    # the last hours are kept for validation
+    dataset = SequenceDataset(scaled_buffer(scaler, data), lookback)
+    train_set, validation_set = dataset.split(1 - validation) if validation else (dataset, None)
+    if not len(train_set):
+        raise ValueError(f"No {name} training windows: {len(data)} hours of data with a lookback of {lookback}")
+    loader = DataLoader(train_set, batch_size=1, shuffle=False)
+    model = model.to(device)
+
+    # Define loss and optimizer
+    criterion = nn.MSELoss()
+    optimizer = optim.Adam(model.parameters(), lr=0.001)
+
+    # picking up an interrupted run where it stopped, only when it trained on the same data and settings
+    settings = run_settings(data, lookback, epochs, patience, validation)
+    state = {'epoch': 0, 'best_loss': float('inf'), 'best_state': None, 'bad_epochs': 0, 'settings': settings}
+    if resume and os.path.exists(resume_path(name)):
+        saved = torch.load(resume_path(name), map_location=device)
+        if saved.get('settings') == settings:
+            model.load_state_dict(saved.pop('model'))
+            optimizer.load_state_dict(saved.pop('optimizer'))
+            state = saved
+            print(f'Resuming {name} after epoch {state["epoch"]}')
+        else:
+            print(f'Ignoring the {name} checkpoint of a run with other data or settings, starting fresh')
+
+    # Fine-tune the model, one window per update as before
+    stopped_early = False
+    for epoch in range(state['epoch'], epochs):
+        model.train()
+        for inputs, targets in loader:
+            inputs, targets = inputs.to(device), targets.to(device)
+
+            # Forward pass
+            outputs = model(inputs)
+            loss = criterion(outputs, targets)
+
+            # Backward pass and optimization
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+        # without validation windows the training loss decides
+        if validation_set is not None and len(validation_set):
+            epoch_loss = validation_loss(model, DataLoader(validation_set, batch_size=64), criterion)
+        else:
+            epoch_loss = loss.item()
+        print(f'{name} Epoch [{epoch + 1}/{epochs}], Loss: {loss.item():.4f}, Validation loss: {epoch_loss:.4f}')
+
+        if epoch_loss < state['best_loss']:
+            state['best_loss'] = epoch_loss
+            state['best_state'] = {k: v.detach().clone() for k, v in model.state_dict().items()}
+            state['bad_epochs'] = 0
+        else:
+            state['bad_epochs'] += 1
+        state['epoch'] = epoch + 1
+        torch.save({**state, 'model': model.state_dict(), 'optimizer': optimizer.state_dict()}, resume_path(name))
+
+        if patience is not None and state['bad_epochs'] >= patience and epoch + 1 < epochs:
+            stopped_early = True
+            break
+
+    # Save the best fine-tuned weights where the inference registry loads them from
+    if state['best_state'] is not None:
+        model.load_state_dict(state['best_state'])
+    model.eval()
+    torch.save(model.state_dict(), checkpoint_path(name))
+    if os.path.exists(resume_path(name)):
+        os.remove(resume_path(name))
+    registry.clear([name])
+
+    return {
+        'pollutant': name,
+        'epochs': state['epoch'],
+        'stopped_early': stopped_early,
+        'validation_loss': state['best_loss'],
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def _init_worker(num_threads):
+    # every worker process gets its own slice of the cores
+    torch.set_num_threads(num_threads)
+
+
+# Fine-tune all pollutants function
+def fine_tune_all_pollutants(lookback=LOOKBACK, epochs=3, workers=None, patience=PATIENCE, pollutants=None):
+    # one process per pollutant, the cores are split between the workers
+    pollutants = list(pollutants or FORECAST_MODELS)
+    cores = os.cpu_count() or 1
+    workers = workers or min(len(pollutants), cores)
+    num_threads = max(1, cores // workers)
+    started = time.perf_counter()
+
+    summary = []
+    # spawned workers do not inherit the parent's OpenMP state
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(num_threads,)) as executor:
+        jobs = [executor.submit(fine_tune_pollutant_model, pollutant, lookback, epochs, None, patience)
+                for pollutant in pollutants]
+        for job in as_completed(jobs):
+            summary.append(job.result())
+    # the workers cleared their own registries, this process still holds the old weights
+    registry.clear(pollutants)
+
+    summary = pd.DataFrame(summary).set_index('pollutant').loc[[model_name(p) for p in pollutants]]
+    print(summary.to_string())
+    print(f'{len(pollutants)} models fine-tuned in {time.perf_counter() - started:.1f} s '
+          f'({workers} workers x {num_threads} threads)')
+    return summary
+
+
+if __name__ == '__main__':
+    fine_tune_all_pollutants(lookback=LOOKBACK, epochs=5)
@@ -0,0 +1,261 @@
+import os
+import shutil
+import threading
+import numpy as np
+import pandas as pd
+
+# pyarrow is only needed for the parquet datasets, without it everything is read from the csv files
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pa_fs
+except ImportError:
+    pa = None
+
+
+# forecast file written by the forecasting notebooks
+FORECAST_FILE = 'forecasted_pollutant.csv'
+
+# numeric columns of the forecast, stored as float32
+POLLUTANTS = ['Aqi', 'Carbon_monoxide', 'Dust', 'Nitrogen_dioxide', 'Ozone', 'Pm_10', 'Pm_25', 'Sulphur_dioxide']
+
+# hourly csv tables and the name of their date column
+SOURCES = {
+    'forecasted_pollutant.csv': 'Unnamed: 0',
+    'last_year_pollutant.csv': 'Date',
+    'aqi_forecast.csv': 'date',
+    'aqi_7_days_lag.csv': 'date',
+    'aqi_14_days_lag.csv': 'date',
+    'aqi_30_days_lag.csv': 'date',
+    'ready_historical.csv': 'date',
+}
+
+# loaded forecasts keyed by path, each entry is (version, ForecastIndex)
+_frames = {}
+_lock = threading.Lock()
+
+
+def dataset_path(path):
+    # forecasted_pollutant.csv -> forecasted_pollutant.parquet/
+    return os.path.splitext(path)[0] + '.parquet'
+
+
+def _use_dataset(path):
+    # the parquet dataset is used when pyarrow is available and it is not older than the csv
+    if pa is None or not os.path.isdir(dataset_path(path)):
+        return False
+    if not os.path.exists(path):
+        return True
+    return os.stat(dataset_path(path)).st_mtime_ns >= os.stat(path).st_mtime_ns
+
+
+def source_path(path):
+    # the csv file or dataset directory a table is currently read from
+    return dataset_path(path) if _use_dataset(path) else path
+
+
+def forecast_version(path=FORECAST_FILE):
+    # identifies the currently published version of a table (csv or dataset)
+    stat = os.stat(source_path(path))
+    return (stat.st_ino, stat.st_mtime_ns)
+
+
+def source_versions(sources):
+    # versions of several tables as an array for the stores built from them, missing tables count as (0, 0)
+    versions = []
+    for source in sources:
+        try:
+            versions.append(forecast_version(source))
+        except OSError:
+            versions.append((0, 0))
+    return np.array(versions, dtype=np.int64)
+
+
+def write_dataset(df, path):
+    # writing an hourly table as a parquet dataset next to its csv, partitioned by day and District
+    # df is indexed by date (or has a date column) and has a District column
+    table = df.copy() if 'date' in df.columns else df.rename_axis('date').reset_index()
+    table['date'] = pd.to_datetime(table['date'])
+    table['day'] = table['date'].dt.strftime('%Y-%m-%d')
+    table['District'] = table['District'].astype(str)
+    for column in table.columns:
+        if column not in ('date', 'day', 'District') and pd.api.types.is_float_dtype(table[column]):
+            table[column] = table[column].astype('float32')
+    table = table.sort_values(['date', 'Location_id'] if 'Location_id' in table.columns else ['date'])
+
+    # writing into a temporary directory and swapping it in, so readers never see half a dataset
+    target = dataset_path(path)
+    tmp, old = target + '.tmp', target + '.old'
+    shutil.rmtree(tmp, ignore_errors=True)
+    ds.write_dataset(
+        pa.Table.from_pandas(table, preserve_index=False),
+        tmp,
+        format='parquet',
+        partitioning=['day', 'District'],
+        partitioning_flavor='hive',
+    )
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.isdir(target):
+        os.rename(target, old)
+    os.rename(tmp, target)
+    shutil.rmtree(old, ignore_errors=True)
+    return target
+
+
+def export_datasets(paths=None):
+    # converting the csv tables that exist in the working directory into parquet datasets
+    written = []
+    for path, date_column in SOURCES.items():
+        if paths is not None and path not in paths:
+            continue
+        if not os.path.exists(path):
+            continue
+        df = pd.read_csv(path).rename(columns={date_column: 'date'})
+        written.append(write_dataset(df, path))
+    return written
+
+
+def _open_dataset(path):
+    # memory-mapped dataset, day and District come back from the directory names
+    partitioning = ds.partitioning(pa.schema([('day', pa.string()), ('District', pa.string())]), flavor='hive')
+    return ds.dataset(
+        dataset_path(path),
+        format='parquet',
+        partitioning=partitioning,
+        filesystem=pa_fs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def _dataset_to_frame(table):
+    df = table.to_pandas()
+    df = df.drop(columns=['day']).set_index('date')
+    df['District'] = df['District'].astype('category')
+    return df
+
+
+def _read_csv(path, date_column):
+    df = pd.read_csv(path).rename(columns={date_column: 'date'})
+    df['date'] = pd.to_datetime(df['date'])
+    return df.set_index('date')
+
+
+def read_window(path, initial_time=None, final_time=None, district=None, columns=None):
+    # rows of an hourly table between initial_time and final_time (both inclusive) for one district,
+    # the filters are pushed down to the parquet dataset and applied after loading for the csv
+    if _use_dataset(path):
+        dataset = _open_dataset(path)
+        filters = []
+        if initial_time is not None:
+            initial_time = pd.to_datetime(initial_time)
+            filters += [ds.field('day') >= initial_time.strftime('%Y-%m-%d'), ds.field('date') >= initial_time]
+        if final_time is not None:
+            final_time = pd.to_datetime(final_time)
+            filters += [ds.field('day') <= final_time.strftime('%Y-%m-%d'), ds.field('date') <= final_time]
+        if district is not None:
+            filters.append(ds.field('District') == district)
+        condition = None
+        for f in filters:
+            condition = f if condition is None else condition & f
+        wanted = None if columns is None else list(dict.fromkeys(['date', 'day', 'District'] + list(columns)))
+        df = _dataset_to_frame(dataset.to_table(columns=wanted, filter=condition))
+    else:
+        df = _read_csv(path, SOURCES.get(os.path.basename(path), 'date'))
+        mask = np.ones(len(df), dtype=bool)
+        if initial_time is not None:
+            mask &= df.index >= pd.to_datetime(initial_time)
+        if final_time is not None:
+            mask &= df.index <= pd.to_datetime(final_time)
+        if district is not None:
+            mask &= (df['District'] == district).values
+        df = df[mask]
+    return df if columns is None else df[columns]
+
+
+def _parse_forecast(path):
+    if _use_dataset(path):
+        forecasted_df = _dataset_to_frame(_open_dataset(path).to_table())
+        for pollutant in POLLUTANTS:
+            forecasted_df[pollutant] = forecasted_df[pollutant].astype('float32')
+        return forecasted_df
+    # parsing the csv straight into the typed columns
+    dtypes = {pollutant: 'float32' for pollutant in POLLUTANTS}
+    dtypes['District'] = 'category'
+    forecasted_df = pd.read_csv(path, dtype=dtypes)
+    # replacing unnamed column with date
+    forecasted_df = forecasted_df.rename(columns={'Unnamed: 0': 'date'})
+    # converting the date column to datetime and setting it as index
+    forecasted_df['date'] = pd.to_datetime(forecasted_df['date'])
+    forecasted_df = forecasted_df.set_index('date')
+    return forecasted_df
+
+
+class ForecastIndex:
+    # the forecast in two sorted blocks so hour and window lookups are binary searches:
+    # by_time is ordered by date, by_district is ordered by (District, date) and
+    # rows offsets[code]:offsets[code + 1] of it belong to District category code
+
+    def __init__(self, forecasted_df):
+        forecasted_df = forecasted_df.copy()
+        forecasted_df['District'] = forecasted_df['District'].astype('category')
+        self.by_time = forecasted_df.sort_index(kind='stable')
+        self.times = self.by_time.index.values
+
+        codes = self.by_time['District'].cat.codes.to_numpy()
+        order = np.argsort(codes, kind='stable')
+        self.by_district = self.by_time.iloc[order]
+        self.district_times = self.by_district.index.values
+        self.categories = self.by_time['District'].cat.categories
+        self.offsets = np.searchsorted(codes[order], np.arange(len(self.categories) + 1))
+
+    def hour(self, date_hour, columns):
+        # all location rows of a single forecast hour
+        date_hour = np.datetime64(pd.to_datetime(date_hour))
+        lo = np.searchsorted(self.times, date_hour, side='left')
+        hi = np.searchsorted(self.times, date_hour, side='right')
+        return self.by_time.iloc[lo:hi][columns]
+
+    def window(self, initial_time, final_time, district, columns):
+        # rows of one district between initial_time and final_time (both inclusive)
+        if district not in self.categories:
+            return self.by_district.iloc[0:0][columns]
+        code = self.categories.get_loc(district)
+        start, stop = self.offsets[code], self.offsets[code + 1]
+        times = self.district_times[start:stop]
+        lo = start + np.searchsorted(times, np.datetime64(pd.to_datetime(initial_time)), side='left')
+        hi = start + np.searchsorted(times, np.datetime64(pd.to_datetime(final_time)), side='right')
+        return self.by_district.iloc[lo:hi][columns]
+
+
+def load_index(path=FORECAST_FILE):
+    # returning the shared index, parsing the file again only when it changed on disk
+    # the frames are shared by every caller in the process, so they must not be modified in place
+    version = forecast_version(path)
+    with _lock:
+        cached = _frames.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        index = ForecastIndex(_parse_forecast(path))
+        _frames[path] = (version, index)
+        return index
+
+
+def load_forecast(path=FORECAST_FILE):
+    # the shared forecast frame, sorted by date
+    return load_index(path).by_time
+
+
+def get_hour(date_hour, columns, path=FORECAST_FILE):
+    # all location rows of a single forecast hour
+    return load_index(path).hour(date_hour, columns)
+
+
+def get_window(initial_time, final_time, district, columns=POLLUTANTS, path=FORECAST_FILE):
+    # rows of one district between initial_time and final_time (both inclusive)
+    return load_index(path).window(initial_time, final_time, district, columns)
+
+
+if __name__ == '__main__':
+    # run after the forecasts are written to add the parquet copies of every csv and their rollups
+    from rollups import export_rollups
+    for written in export_datasets() + export_rollups():
+        print(f'Saved {written}')
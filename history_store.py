@@ -0,0 +1,233 @@
+import os
+import time
+import uuid
+import numpy as np
+import pandas as pd
+
+# partitions are parquet files when pyarrow is available, csv files otherwise
+try:
+    import pyarrow
+    EXTENSION = '.parquet'
+except ImportError:
+    pyarrow = None
+    EXTENSION = '.csv'
+
+
+# collected hourly history, one directory per day holding one file per ingestion batch:
+# history/day=2024-05-26/part-<time>-<id>.parquet
+HISTORY_DIR = 'history'
+
+LOCATIONS_FILE = 'locations.csv'
+
+# measured variables as collected from Open-Meteo
+VARIABLES = ['pm10', 'pm2_5', 'carbon_monoxide', 'nitrogen_dioxide', 'sulphur_dioxide', 'ozone', 'dust']
+
+# model names whose variable is named differently
+MODEL_VARIABLES = {'pm_10': 'pm10', 'pm_25': 'pm2_5'}
+
+KEY = ['Date', 'Location_id']
+
+# every variable of the stored hours as one dense (hours, locations, variables) float32 array,
+# hour and location ids sit next to it in history_tensor_index.npz
+TENSOR_FILE = 'history_tensor.npy'
+
+
+def day_dir(day, root=HISTORY_DIR):
+    return os.path.join(root, f'day={day}')
+
+
+def days(root=HISTORY_DIR, start=None, end=None):
+    # days with collected data between start and end (both inclusive), from the directory names only
+    if not os.path.isdir(root):
+        return []
+    found = sorted(name[4:] for name in os.listdir(root) if name.startswith('day='))
+    start = None if start is None else str(pd.Timestamp(start).date())
+    end = None if end is None else str(pd.Timestamp(end).date())
+    return [day for day in found if (start is None or day >= start) and (end is None or day <= end)]
+
+
+def _read_part(path, columns=None):
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns, parse_dates=['Date'] if columns is None or 'Date' in columns else None)
+
+
+def _read_day(day, root=HISTORY_DIR, columns=None):
+    directory = day_dir(day, root)
+    parts = [_read_part(os.path.join(directory, name), columns) for name in sorted(os.listdir(directory))
+             if name.startswith('part-')]
+    if not parts:
+        return pd.DataFrame(columns=columns or KEY + VARIABLES)
+    return pd.concat(parts, ignore_index=True)
+
+
+def _write_part(frame, directory):
+    # a new file per batch, written aside and renamed so readers never see half a partition
+    os.makedirs(directory, exist_ok=True)
+    name = f'part-{time.time_ns()}-{uuid.uuid4().hex[:8]}{EXTENSION}'
+    tmp = os.path.join(directory, '.' + name)
+    if EXTENSION == '.parquet':
+        frame.to_parquet(tmp, index=False)
+    else:
+        frame.to_csv(tmp, index=False)
+    os.replace(tmp, os.path.join(directory, name))
+    return os.path.join(directory, name)
+
+
+def normalize(batch):
+    # a collected batch (date, location_id and the measured variables) in the stored schema
+    batch = batch.rename(columns={'date': 'Date', 'location_id': 'Location_id'})
+    table = pd.DataFrame({
+        'Date': pd.to_datetime(batch['Date']),
+        'Location_id': batch['Location_id'].astype('int32'),
+    })
+    for variable in VARIABLES:
+        table[variable] = batch[variable].astype('float32')
+    # duplicates inside the batch keep their last value
+    return table.drop_duplicates(KEY, keep='last')
+
+
+def append(batch, root=HISTORY_DIR):
+    # appending a batch, hours already stored for a location are skipped so every
+    # (Date, Location_id) is stored once and readers never deduplicate
+    table = normalize(batch)
+    written = []
+    for day, rows in table.groupby(table['Date'].dt.strftime('%Y-%m-%d')):
+        if os.path.isdir(day_dir(day, root)):
+            stored = _read_day(day, root, KEY)
+            stored_keys = pd.MultiIndex.from_frame(stored.astype({'Location_id': 'int32'}))
+            rows = rows[~pd.MultiIndex.from_frame(rows[KEY]).isin(stored_keys)]
+        if len(rows):
+            written.append(_write_part(rows.sort_values(KEY), day_dir(day, root)))
+    return written
+
+
+def read_history(start=None, end=None, columns=None, root=HISTORY_DIR):
+    # long table of the stored hours between start and end (both inclusive)
+    columns = None if columns is None else KEY + [column for column in columns if column not in KEY]
+    frames = [_read_day(day, root, columns) for day in days(root, start, end)]
+    if not frames:
+        return pd.DataFrame(columns=columns or KEY + VARIABLES)
+    table = pd.concat(frames, ignore_index=True)
+    table['Date'] = pd.to_datetime(table['Date'])
+    if start is not None:
+        table = table[table['Date'] >= pd.Timestamp(start)]
+    if end is not None:
+        table = table[table['Date'] <= pd.Timestamp(end)]
+    return table.sort_values(KEY, ignore_index=True)
+
+
+def reshape(table, locations=None, variables=VARIABLES, hours=None):
+    # long table -> dense (hours, locations, variables) float32 array in one pass, rows are placed by
+    # the integer codes of their hour and location. keys are unique, so nothing is aggregated
+    if locations is None:
+        locations = pd.read_csv(LOCATIONS_FILE)['id'].to_numpy()
+    locations = np.sort(np.asarray(locations))
+    dates = table['Date'].to_numpy()
+    if hours is None:
+        hours, hour_index = np.unique(dates, return_inverse=True)
+    else:
+        hours = np.asarray(hours, dtype='datetime64[ns]')
+        hour_index = np.searchsorted(hours, dates).clip(max=len(hours) - 1)
+    ids = table['Location_id'].to_numpy()
+    location_index = np.searchsorted(locations, ids).clip(max=len(locations) - 1)
+    known = (locations[location_index] == ids) & (hours[hour_index] == dates) if len(hours) else ids < 0
+
+    tensor = np.full((len(hours), len(locations), len(variables)), np.nan, dtype='float32')
+    tensor[hour_index[known], location_index[known]] = table[list(variables)].to_numpy(dtype='float32')[known]
+    return tensor, pd.DatetimeIndex(hours, name='date'), locations
+
+
+def pivot(pollutant, start=None, end=None, root=HISTORY_DIR, locations=None):
+    # hours x locations matrix of one variable, columns are the location ids as floats like the
+    # pivot_table of the notebooks
+    variable = MODEL_VARIABLES.get(pollutant, pollutant)
+    if variable not in VARIABLES:
+        raise ValueError(f"Invalid pollutant name: {pollutant}")
+    table = read_history(start, end, [variable], root)
+    matrix, hours, locations = reshape(table, locations, [variable])
+    return pd.DataFrame(matrix[:, :, 0], index=hours, columns=locations.astype(float))
+
+
+def latest(pollutant, hours, root=HISTORY_DIR):
+    # last hours of a variable, only the days needed are read
+    stored = days(root)
+    if not stored:
+        raise ValueError(f"No history stored in {root}")
+    start = pd.Timestamp(stored[-1]) - pd.Timedelta(days=-(-hours // 24))
+    return pivot(pollutant, start=start, root=root).iloc[-hours:]
+
+
+def tensor_index_path(path=TENSOR_FILE):
+    return os.path.splitext(path)[0] + '_index.npz'
+
+
+def write_tensor(path=TENSOR_FILE, root=HISTORY_DIR, start=None, end=None, locations=None):
+    # writing every stored hour to one memory-mappable .npy file, filled day by day so the long
+    # table is never held in memory. hours run without gaps from the first to the last stored day,
+    # missing hours stay NaN
+    stored = days(root, start, end)
+    if not stored:
+        raise ValueError(f"No history stored in {root}")
+    if locations is None:
+        locations = pd.read_csv(LOCATIONS_FILE)['id'].to_numpy()
+    locations = np.sort(np.asarray(locations))
+    hours = pd.date_range(stored[0], pd.Timestamp(stored[-1]) + pd.Timedelta(hours=23), freq='h')
+    if start is not None:
+        hours = hours[hours >= pd.Timestamp(start)]
+    if end is not None:
+        hours = hours[hours <= pd.Timestamp(end)]
+
+    tmp = path + '.tmp.npy'
+    tensor = np.lib.format.open_memmap(tmp, mode='w+', dtype='float32',
+                                       shape=(len(hours), len(locations), len(VARIABLES)))
+    tensor[:] = np.nan
+    for day in stored:
+        table = _read_day(day, root)
+        table['Date'] = pd.to_datetime(table['Date'])
+        first, last = hours.searchsorted([pd.Timestamp(day), pd.Timestamp(day) + pd.Timedelta(days=1)])
+        tensor[first:last] = reshape(table, locations, hours=hours[first:last].values)[0]
+    tensor.flush()
+    del tensor
+    np.savez(tensor_index_path(path) + '.tmp.npz', hours=hours.values, locations=locations)
+    os.replace(tmp, path)
+    os.replace(tensor_index_path(path) + '.tmp.npz', tensor_index_path(path))
+    return path
+
+
+def load_tensor(path=TENSOR_FILE):
+    # (tensor, hours, locations), the tensor is memory-mapped and only the slices used are read
+    tensor = np.load(path, mmap_mode='r')
+    with np.load(tensor_index_path(path)) as index:
+        hours, locations = pd.DatetimeIndex(index['hours'], name='date'), index['locations']
+    return tensor, hours, locations
+
+
+def tensor_frame(pollutant, start=None, end=None, path=TENSOR_FILE):
+    # hours x locations frame of one variable sliced from the tensor, shaped like pivot
+    variable = MODEL_VARIABLES.get(pollutant, pollutant)
+    if variable not in VARIABLES:
+        raise ValueError(f"Invalid pollutant name: {pollutant}")
+    tensor, hours, locations = load_tensor(path)
+    first = 0 if start is None else hours.searchsorted(pd.Timestamp(start))
+    last = len(hours) if end is None else hours.searchsorted(pd.Timestamp(end), side='right')
+    return pd.DataFrame(tensor[first:last, :, VARIABLES.index(variable)], index=hours[first:last],
+                        columns=locations.astype(float))
+
+
+def import_csv(path, root=HISTORY_DIR):
+    # moving a data_store csv (date, variables, latitude, longitude) into the store,
+    # the location is found from its coordinates like data_loader did
+    data = pd.read_csv(path)
+    if 'location_id' not in data.columns:
+        locations = pd.read_csv(LOCATIONS_FILE)
+        data = data.merge(locations, on=['latitude', 'longitude'], how='inner').rename(columns={'id': 'location_id'})
+    return append(data, root)
+
+
+def import_data_store(folder='data_store', root=HISTORY_DIR):
+    written = []
+    for file in sorted(os.listdir(folder)):
+        if file.endswith('.csv'):
+            written += import_csv(os.path.join(folder, file), root)
+    return written
@@ -0,0 +1,417 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import torch
+import history_store
+from location_districts import district_of
+from models import CNN_LSTM, LOOKBACK
+from scalers import load_params
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(ROOT, 'pol_models')
+
+# model name -> scaler name, the AQI lag models share the AQI scaler
+MODELS = {
+    'carbon_monoxide': 'carbon_monoxide',
+    'dust': 'dust',
+    'nitrogen_dioxide': 'nitrogen_dioxide',
+    'ozone': 'ozone',
+    'pm_10': 'pm_10',
+    'pm_25': 'pm_25',
+    'sulphur_dioxide': 'sulphur_dioxide',
+    'aqi': 'aqi',
+    'aqi_last_7': 'aqi',
+    'aqi_last_14': 'aqi',
+    'aqi_last_30': 'aqi',
+}
+
+# weights of the AQI the models were trained on, applied to the pollutant histories
+AQI_WEIGHTS = {
+    'pm_25': 0.25,
+    'pm_10': 0.25,
+    'nitrogen_dioxide': 0.15,
+    'sulphur_dioxide': 0.1,
+    'carbon_monoxide': 0.1,
+    'ozone': 0.1,
+    'dust': 0.05,
+}
+
+# Number of hours in 14 days
+FORECAST_HORIZON = 14 * 24
+
+# intra-op threads used by the forecasts, 0 keeps the torch default
+NUM_THREADS = int(os.environ.get('FORECAST_NUM_THREADS', '0'))
+
+# model variants written by export_models.py: fp32 is the checkpoint itself, int8 has dynamically
+# quantized LSTM/Linear layers and script is the frozen TorchScript of the fp32 model
+VARIANTS = ('fp32', 'int8', 'script')
+
+# variant used by the registry, 'auto' picks the fastest one within VARIANT_TOLERANCE of fp32
+MODEL_VARIANT = os.environ.get('FORECAST_MODEL_VARIANT', 'fp32')
+
+# largest relative RMSE increase over fp32 accepted by 'auto'
+VARIANT_TOLERANCE = 0.01
+
+# accuracy and latency of every variant, written by export_models.py
+VARIANT_REPORT = os.path.join(MODEL_DIR, 'variants.json')
+
+
+def model_name(pollutant):
+    # accepts the forecast column names too, e.g. Pm_10 -> pm_10
+    name = pollutant.lower()
+    if name not in MODELS:
+        raise ValueError(f"Invalid pollutant name: {pollutant}")
+    return name
+
+
+def configure(num_threads=None):
+    # setting the CPU thread count of the forecasts
+    global NUM_THREADS
+    if num_threads is not None:
+        NUM_THREADS = num_threads
+    if NUM_THREADS > 0:
+        torch.set_num_threads(NUM_THREADS)
+
+
+def load_model(name, map_location='cpu'):
+    # the checkpoints are state_dicts saved from the notebooks, some of them on a GPU
+    model = CNN_LSTM()
+    state = torch.load(os.path.join(MODEL_DIR, f'{name}_model_state.pt'), map_location=map_location)
+    model.load_state_dict(state)
+    return model.eval()
+
+
+def quantize(model):
+    # int8 weights for the LSTM and Linear layers, activations are quantized on the fly
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.LSTM, torch.nn.Linear}, dtype=torch.qint8)
+
+
+def variant_path(name, variant):
+    return os.path.join(MODEL_DIR, f'{name}_model_{variant}.pt')
+
+
+def build_variant(name, variant):
+    # a variant made from the fp32 checkpoint in this process
+    model = load_model(name)
+    if variant == 'int8':
+        return quantize(model)
+    if variant == 'script':
+        return torch.jit.freeze(torch.jit.script(model))
+    return model
+
+
+def load_variant(name, variant):
+    # exported TorchScript files are used when they exist, otherwise the variant is built
+    if variant not in VARIANTS:
+        raise ValueError(f"Invalid model variant: {variant}")
+    if variant != 'fp32' and os.path.exists(variant_path(name, variant)):
+        return torch.jit.load(variant_path(name, variant), map_location='cpu').eval()
+    return build_variant(name, variant)
+
+
+def select_variant(name):
+    # variant of a model the registry loads
+    if MODEL_VARIANT != 'auto':
+        return MODEL_VARIANT
+    if not os.path.exists(VARIANT_REPORT):
+        return 'fp32'
+    with open(VARIANT_REPORT) as f:
+        report = json.load(f).get(name)
+    if not report:
+        return 'fp32'
+    limit = report['fp32']['rmse'] * (1 + VARIANT_TOLERANCE)
+    allowed = [variant for variant in VARIANTS if variant in report and report[variant]['rmse'] <= limit]
+    return min(allowed, key=lambda variant: report[variant]['ms_per_step'])
+
+
+def load_scaler(name):
+    # min/scale of the fitted MinMaxScaler, read from pol_models/ without scikit-learn once exported
+    return load_params(MODELS[name])
+
+
+class ModelRegistry:
+    # models and scalers loaded once per process and shared by every caller
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, pollutant):
+        # (model, scaler) of a pollutant, loaded on first use
+        name = model_name(pollutant)
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = (load_variant(name, select_variant(name)), load_scaler(name))
+            return self._entries[name]
+
+    def warm(self, pollutants=None):
+        # loading every model up front, e.g. when a worker starts
+        for pollutant in pollutants or MODELS:
+            self.get(pollutant)
+        return self
+
+    def clear(self, pollutants=None):
+        # dropping loaded models, e.g. after their checkpoints were fine-tuned
+        with self._lock:
+            if pollutants is None:
+                self._entries.clear()
+            for pollutant in pollutants or ():
+                self._entries.pop(model_name(pollutant), None)
+
+
+registry = ModelRegistry()
+
+
+def read_update(name, path=None):
+    # hourly history of a pollutant as written by the data collection (date x Location_id)
+    path = path or f'update_{name}.csv'
+    return pd.read_csv(path, parse_dates=['date'], index_col='date')
+
+
+def read_latest(name, lookback):
+    # last hours of a pollutant from the history store, or from its update file before the store exists
+    if os.path.isdir(history_store.HISTORY_DIR):
+        data = history_store.latest(name, lookback)
+        # named like the columns of the update files the scalers were fitted on
+        data.columns = data.columns.astype(str)
+        return data
+    return read_update(name).iloc[-lookback:]
+
+
+def read_training(name):
+    # whole hourly history of a model for training and fine-tuning, sliced from the history tensor
+    # when it was written, from the update file otherwise
+    if not os.path.exists(history_store.TENSOR_FILE):
+        return read_update(name)
+    if MODELS[name] == 'aqi':
+        data = sum(history_store.tensor_frame(source) * weight for source, weight in AQI_WEIGHTS.items())
+    else:
+        data = history_store.tensor_frame(name)
+    data.columns = data.columns.astype(str)
+    return data
+
+
+def history(pollutant, lookback=LOOKBACK):
+    # last lookback hours the forecast of a pollutant starts from
+    name = model_name(pollutant)
+    if MODELS[name] == 'aqi':
+        data = sum(read_latest(source, lookback) * weight for source, weight in AQI_WEIGHTS.items())
+    else:
+        data = read_latest(name, lookback)
+    return data.iloc[-lookback:]
+
+
+# largest difference allowed between the incremental and the full rollout, in scaled units (0-1)
+INCREMENTAL_TOLERANCE = 1e-4
+
+
+class IncrementalRollout:
+    # autoregressive rollout of a CNN_LSTM that keeps the conv1 outputs of past hours
+    #
+    # the window lives in a preallocated ring buffer stored twice (slot i and i + lookback), so
+    # every window is a contiguous slice and nothing is concatenated. conv1 has a receptive field
+    # of three hours, its output for an hour inside the window only depends on that hour and its
+    # neighbours and is cached. every step computes three conv1 columns: the two window edges
+    # (they see the zero padding) and the hour before the new one.
+    # the pooling pairs shift with every step, so conv2 and everything after it run on the whole
+    # (already small) pooled sequence. the LSTM state cannot be carried forward: the model starts
+    # every window from a zero state and the first hours leave the window at each step, so the
+    # hidden state of the new window is not the old one advanced by one hour.
+
+    def __init__(self, model, window):
+        self.model = model
+        batch, lookback, locations = window.shape
+        self.lookback = lookback
+        conv1 = model.conv1
+        # inputs and conv1 outputs, channels first, each slot stored twice
+        self.inputs = torch.zeros(batch, locations, 2 * lookback)
+        self.conv1 = torch.zeros(batch, conv1.out_channels, 2 * lookback)
+        self.tail = torch.zeros(3 * batch, locations, 3)
+        # conv1 on a three hour slice is a single matrix product
+        self.weight = conv1.weight.detach().reshape(conv1.out_channels, -1).t()
+        self.bias = conv1.bias.detach()
+        self.start = 0
+
+        x = window.permute(0, 2, 1)
+        self.inputs[:, :, :lookback] = x
+        self.inputs[:, :, lookback:] = x
+        out = conv1(x)
+        self.conv1[:, :, :lookback] = out
+        self.conv1[:, :, lookback:] = out
+
+    def _write(self, buffer, slot, values):
+        buffer[:, :, slot] = values
+        buffer[:, :, slot + self.lookback] = values
+
+    def predict(self):
+        # next hour of the current window
+        model = self.model
+        n, start = self.lookback, self.start
+        batch = self.inputs.shape[0]
+        x = self.inputs[:, :, start:start + n]
+
+        # conv1 columns that see the padding, the right one only exists for this window
+        tail = self.tail
+        tail[:batch, :, 0] = 0
+        tail[:batch, :, 1:] = x[:, :, :2]
+        tail[batch:2 * batch] = x[:, :, n - 3:]
+        tail[2 * batch:, :, :2] = x[:, :, n - 2:]
+        tail[2 * batch:, :, 2] = 0
+        edges = torch.addmm(self.bias, tail.reshape(3 * batch, -1), self.weight)
+
+        # the hour before the last is now inside the window, its output is kept for later windows
+        self._write(self.conv1, (start + n - 2) % n, edges[batch:2 * batch])
+
+        out = self.conv1[:, :, start:start + n].clone()
+        out[:, :, 0] = edges[:batch]
+        out[:, :, n - 1] = edges[2 * batch:]
+
+        out = model.pool(model.relu(out))
+        out = model.pool(model.relu(model.conv2(out)))
+        out, _ = model.lstm(out.permute(0, 2, 1))
+        out = model.relu(model.fc1(out[:, -1, :]))
+        return model.fc2(out)
+
+    def push(self, prediction):
+        # sliding the window by one hour, the prediction replaces the oldest hour
+        self._write(self.inputs, self.start, prediction)
+        self.start = (self.start + 1) % self.lookback
+
+
+def rollout(model, window, horizon, incremental=True):
+    # autoregressive forecast of horizon hours from a (1, lookback, locations) window
+    forecasted_values = []
+    # TorchScript variants do not expose their layers, they recompute every window
+    if incremental and isinstance(model, CNN_LSTM):
+        state = IncrementalRollout(model, window)
+        for _ in range(horizon):
+            prediction = state.predict()
+            forecasted_values.append(prediction)
+            state.push(prediction)
+        return torch.cat(forecasted_values).numpy()
+
+    current_sequence = window
+    for _ in range(horizon):
+        prediction = model(current_sequence)
+        forecasted_values.append(prediction)
+        # Update the sequence by appending the prediction and removing the first time step
+        current_sequence = torch.cat((current_sequence[:, 1:, :], prediction.unsqueeze(1)), dim=1)
+    return torch.cat(forecasted_values).numpy()
+
+
+def forecast(pollutant, horizon=FORECAST_HORIZON, data=None):
+    # forecast of the next horizon hours of every location, indexed by hour
+    # data is the hourly history (date x Location_id), by default the collected update file
+    model, scaler = registry.get(pollutant)
+    if data is None:
+        data = history(pollutant)
+    data = data.iloc[-LOOKBACK:]
+    if len(data) < LOOKBACK:
+        raise ValueError(f"{LOOKBACK} hours of history are needed, got {len(data)}")
+
+    configure()
+    # the window and the predictions are scaled in place as float32, no float64 copy is made
+    window = torch.from_numpy(scaler.transform_(data.to_numpy(dtype=np.float32, copy=True))).unsqueeze(0)
+    with torch.inference_mode():
+        forecasted_values = rollout(model, window, horizon)
+
+    # Inverse transform the predictions to original scale
+    forecasted_values_inverse = scaler.inverse_transform_(forecasted_values)
+    index = pd.date_range(start=data.index[-1] + pd.Timedelta(hours=1), periods=horizon, freq='h')
+    return pd.DataFrame(forecasted_values_inverse, index=index, columns=data.columns)
+
+
+# pollutant models forecast together for the dashboard, model name -> forecast column
+FORECAST_MODELS = {
+    'carbon_monoxide': 'Carbon_monoxide',
+    'dust': 'Dust',
+    'nitrogen_dioxide': 'Nitrogen_dioxide',
+    'ozone': 'Ozone',
+    'pm_10': 'Pm_10',
+    'pm_25': 'Pm_25',
+    'sulphur_dioxide': 'Sulphur_dioxide',
+}
+
+def forecast_all(pollutants=None, horizon=FORECAST_HORIZON, data=None, workers=None):
+    # forecasts of several pollutants stepped side by side, {pollutant: frame}
+    # the models run on a thread pool (torch releases the GIL inside its ops) and the CPU threads
+    # are split between them, so on a many-core box every model gets its own share of the cores
+    pollutants = list(pollutants or FORECAST_MODELS)
+    data = data or {}
+    workers = workers or len(pollutants)
+    entries = {pollutant: registry.get(pollutant) for pollutant in pollutants}
+    windows = {}
+    for pollutant in pollutants:
+        history_ = data[pollutant] if pollutant in data else history(pollutant)
+        history_ = history_.iloc[-LOOKBACK:]
+        if len(history_) < LOOKBACK:
+            raise ValueError(f"{LOOKBACK} hours of history are needed, got {len(history_)}")
+        windows[pollutant] = history_
+
+    configure()
+    total_threads = torch.get_num_threads()
+    model_threads = max(1, total_threads // workers)
+
+    def run(pollutant):
+        # the OpenMP thread count is kept per calling thread, so every worker sets its own share
+        torch.set_num_threads(model_threads)
+        model, scaler = entries[pollutant]
+        window = torch.from_numpy(scaler.transform_(windows[pollutant].to_numpy(dtype=np.float32, copy=True))).unsqueeze(0)
+        with torch.inference_mode():
+            return rollout(model, window, horizon)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = dict(zip(pollutants, executor.map(run, pollutants)))
+    finally:
+        torch.set_num_threads(total_threads)
+
+    forecasts = {}
+    for pollutant in pollutants:
+        model, scaler = entries[pollutant]
+        history_ = windows[pollutant]
+        index = pd.date_range(start=history_.index[-1] + pd.Timedelta(hours=1), periods=horizon, freq='h')
+        forecasts[pollutant] = pd.DataFrame(scaler.inverse_transform_(results[pollutant]),
+                                            index=index, columns=history_.columns)
+    return forecasts
+
+
+def forecast_table(forecasts):
+    # every pollutant forecast in the long format of forecasted_pollutant.csv, one row per hour and location
+    columns = {}
+    for pollutant, frame in forecasts.items():
+        columns[FORECAST_MODELS[model_name(pollutant)]] = frame.to_numpy().ravel()
+    first = next(iter(forecasts.values()))
+    location_ids = first.columns.astype(float)
+    table = pd.DataFrame(columns, index=np.repeat(first.index.values, len(location_ids)))
+    # AQI of the forecast hours, computed the way the training data was
+    table['Aqi'] = sum(table[FORECAST_MODELS[source]] * weight for source, weight in AQI_WEIGHTS.items())
+    table['Location_id'] = np.tile(location_ids, len(first))
+    table['District'] = np.asarray(district_of(table['Location_id'].to_numpy()), dtype=object)
+    return table[sorted(table.columns)]
+
+
+def publish(horizon=FORECAST_HORIZON, path='forecasted_pollutant.csv'):
+    # nightly job: forecasting every pollutant in one pass and writing the table the dashboard reads
+    table = forecast_table(forecast_all(horizon=horizon))
+    table.to_csv(path)
+    return path
+
+
+if __name__ == '__main__':
+    from forecast_store import export_datasets
+    from rollups import export_rollups
+    from map_snapshots import render_snapshots
+    from year_over_year import write_store
+    written = [publish()]
+    written += export_datasets(['forecasted_pollutant.csv']) + export_rollups(['forecasted_pollutant.csv'])
+    # the maps of every hour are rendered last, once the published forecast is final
+    written.append(render_snapshots())
+    # last years' values and deltas aligned with the new forecast hours
+    written.append(write_store())
+    for path in written:
+        print(f'Saved {path}')
@@ -0,0 +1,145 @@
+import datetime
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from history_store import HISTORY_DIR, TENSOR_FILE, append, write_tensor
+
+
+URL = "https://air-quality-api.open-meteo.com/v1/air-quality"
+
+# The order of variables in hourly is important to assign them correctly below
+HOURLY = ["pm10", "pm2_5", "carbon_monoxide", "nitrogen_dioxide", "sulphur_dioxide", "ozone", "dust"]
+
+LOCATIONS_FILE = "locations.csv"
+DATE_FILE = "date.json"
+
+# coordinates sent in one request and requests in flight at the same time
+BATCH_SIZE = 50
+WORKERS = 8
+
+# days between two scheduled collections, next_date in date.json
+COLLECTION_INTERVAL = 7
+
+
+def make_session(workers=WORKERS):
+    # one connection-pooled session shared by every worker, retrying on errors like retry_requests did
+    session = requests.Session()
+    retries = Retry(total=5, backoff_factor=0.2, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def request_key(query):
+    # recorded responses are keyed by the query with its parameters sorted
+    canonical = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def batch_params(batch, start_date, end_date):
+    # several locations are sent as comma separated coordinates, the API answers with a list
+    return {
+        "latitude": ",".join(str(latitude) for latitude in batch["latitude"]),
+        "longitude": ",".join(str(longitude) for longitude in batch["longitude"]),
+        "hourly": ",".join(HOURLY),
+        "start_date": str(start_date),
+        "end_date": str(end_date),
+        "timezone": "GMT",
+    }
+
+
+def fetch_batch(session, batch, start_date, end_date, url=URL, record_dir=None):
+    # hourly values of a batch of locations as one long frame
+    response = session.get(url, params=batch_params(batch, start_date, end_date), timeout=60)
+    response.raise_for_status()
+    if record_dir is not None:
+        # keeping the raw answer so the stub server can replay it offline
+        os.makedirs(record_dir, exist_ok=True)
+        key = request_key(urlsplit(response.request.url).query)
+        with open(os.path.join(record_dir, f"{key}.json"), "wb") as f:
+            f.write(response.content)
+
+    payload = response.json()
+    # a single location is answered with an object instead of a list
+    if isinstance(payload, dict):
+        payload = [payload]
+
+    frames = []
+    # the answers come back in the order of the requested coordinates, the API snaps them to its grid
+    # so the coordinates of locations.csv are kept
+    for (_, location), result in zip(batch.iterrows(), payload):
+        hourly = result["hourly"]
+        hourly_data = {"date": pd.to_datetime(hourly["time"])}
+        for variable in HOURLY:
+            hourly_data[variable] = pd.Series(hourly[variable], dtype="float64").values
+        hourly_dataframe = pd.DataFrame(data=hourly_data)
+        hourly_dataframe["latitude"] = location["latitude"]
+        hourly_dataframe["longitude"] = location["longitude"]
+        hourly_dataframe["location_id"] = location["id"]
+        frames.append(hourly_dataframe)
+    return pd.concat(frames, ignore_index=True)
+
+
+def fetch(start_date, end_date, locations=None, url=URL, workers=WORKERS, batch_size=BATCH_SIZE, record_dir=None):
+    # hourly values of every location between start_date and end_date (both inclusive)
+    if locations is None:
+        locations = pd.read_csv(LOCATIONS_FILE)
+    batches = [locations.iloc[i:i + batch_size] for i in range(0, len(locations), batch_size)]
+    # the session is closed even when a request fails
+    with make_session(workers) as session, ThreadPoolExecutor(max_workers=workers) as executor:
+        frames = list(executor.map(
+            lambda batch: fetch_batch(session, batch, start_date, end_date, url, record_dir), batches))
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_watermark(path=DATE_FILE):
+    # last day already collected and the day of the next scheduled collection
+    with open(path, "r") as file:
+        data = json.load(file)
+    return datetime.date.fromisoformat(data["last_date"]), datetime.date.fromisoformat(data["next_date"])
+
+
+def write_watermark(last_date, path=DATE_FILE):
+    data = {
+        "last_date": str(last_date),
+        "next_date": str(last_date + datetime.timedelta(days=COLLECTION_INTERVAL))
+    }
+    # replacing the file in one step so a crash never leaves half a watermark
+    with open(path + ".tmp", "w") as file:
+        json.dump(data, file)
+    os.replace(path + ".tmp", path)
+
+
+def missing_days(path=DATE_FILE, today=None):
+    # days after the watermark up to yesterday, the hours of today are not complete yet
+    last_date, _ = read_watermark(path)
+    today = today or datetime.date.today()
+    return last_date + datetime.timedelta(days=1), today - datetime.timedelta(days=1)
+
+
+def ingest(url=URL, date_file=DATE_FILE, today=None, history_dir=HISTORY_DIR, workers=WORKERS, record_dir=None,
+           locations=None, batch_size=BATCH_SIZE, tensor_file=TENSOR_FILE):
+    # collecting the hours missing since the watermark into the history store and moving the watermark forward
+    start_date, end_date = missing_days(date_file, today)
+    if start_date > end_date:
+        print(f"Nothing to collect, data is complete up to {end_date}")
+        return []
+    data = fetch(start_date, end_date, locations=locations, url=url, workers=workers, batch_size=batch_size,
+                 record_dir=record_dir)
+    written = append(data, history_dir)
+    write_watermark(end_date, date_file)
+    # the training tensor follows the store, it is rewritten from the partitions
+    write_tensor(tensor_file, history_dir, locations=None if locations is None else locations["id"].to_numpy())
+    print(f"Saved {len(written)} partitions to {history_dir}")
+    return written
+
+
+if __name__ == "__main__":
+    ingest()
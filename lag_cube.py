@@ -0,0 +1,98 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from forecast_store import source_versions
+from rollups import load_rollup
+
+
+# lagged forecasts compared with the history on the district plot, in the order of the cube
+LAG_SOURCES = ('aqi_30_days_lag.csv', 'aqi_14_days_lag.csv', 'aqi_7_days_lag.csv', 'ready_historical.csv')
+
+# daily max AQI of every district, day and source in one memory-mappable .npy file
+CUBE_FILE = 'aqi_lag_cube.npy'
+
+# the loaded cube, kept while the source versions it was built from are current
+_cube = {}
+_lock = threading.Lock()
+
+
+def cube_index_path(path=CUBE_FILE):
+    # aqi_lag_cube.npy -> aqi_lag_cube_index.npz (districts, days, sources and their versions)
+    return os.path.splitext(path)[0] + '_index.npz'
+
+
+def build_cube(sources=LAG_SOURCES):
+    # (cube, districts, days): districts x days x sources of daily max AQI from the daily_max rollups,
+    # days run without gaps over all sources and days a source does not cover stay NaN
+    series = [load_rollup('daily_max', source)['Aqi'].unstack('District') for source in sources]
+    districts = sorted(set().union(*(frame.columns for frame in series)))
+    first = min(frame.index.min() for frame in series)
+    last = max(frame.index.max() for frame in series)
+    days = pd.date_range(first, last, freq='D', name='date')
+    cube = np.full((len(districts), len(days), len(sources)), np.nan, dtype=np.float32)
+    for i, frame in enumerate(series):
+        frame = frame.reindex(index=days, columns=districts)
+        cube[:, :, i] = frame.to_numpy(dtype=np.float32).T
+    return cube, pd.Index(districts, name='District'), days
+
+
+def write_cube(path=CUBE_FILE, sources=LAG_SOURCES):
+    # building the cube when the lag forecasts are regenerated, the versions of the sources are stored
+    # with it so a stale cube is noticed
+    versions = source_versions(sources)
+    cube, districts, days = build_cube(sources)
+    np.save(path + '.tmp.npy', cube)
+    np.savez(cube_index_path(path) + '.tmp.npz', districts=districts.to_numpy(dtype=str), days=days.values,
+             sources=np.array(sources), versions=versions)
+    os.replace(path + '.tmp.npy', path)
+    os.replace(cube_index_path(path) + '.tmp.npz', cube_index_path(path))
+    return path
+
+
+def _read_cube(path, sources):
+    # the stored cube when it was built from the current sources, otherwise None
+    try:
+        with np.load(cube_index_path(path)) as index:
+            if tuple(index['sources']) != tuple(sources) or not np.array_equal(index['versions'], source_versions(sources)):
+                return None
+            districts = pd.Index(index['districts'].astype(object), name='District')
+            days = pd.DatetimeIndex(index['days'], name='date')
+        return np.load(path, mmap_mode='r'), districts, days
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load_cube(path=CUBE_FILE, sources=LAG_SOURCES):
+    # (cube, districts, days) with the cube memory-mapped, a missing or stale cube is rebuilt once
+    versions = source_versions(sources)
+    with _lock:
+        cached = _cube.get((path, sources))
+        if cached is not None and np.array_equal(cached[0], versions):
+            return cached[1]
+        loaded = _read_cube(path, sources)
+        if loaded is None:
+            try:
+                loaded = _read_cube(write_cube(path, sources), sources)
+            except OSError:
+                loaded = None
+            if loaded is None:
+                # a read-only working directory keeps the cube in memory
+                loaded = build_cube(sources)
+        _cube[(path, sources)] = (versions, loaded)
+        return loaded
+
+
+def district_lags(district, start=None, end=None, path=CUBE_FILE, sources=LAG_SOURCES):
+    # days x sources frame of one district's daily max AQI between start and end (both inclusive)
+    cube, districts, days = load_cube(path, sources)
+    first = 0 if start is None else days.searchsorted(pd.Timestamp(start))
+    last = len(days) if end is None else days.searchsorted(pd.Timestamp(end), side='right')
+    if district not in districts:
+        return pd.DataFrame(columns=list(sources), index=days[0:0], dtype=np.float32)
+    return pd.DataFrame(np.array(cube[districts.get_loc(district), first:last]), index=days[first:last],
+                        columns=list(sources))
+
+
+if __name__ == '__main__':
+    print(f'Saved {write_cube()}')
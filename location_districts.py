@@ -0,0 +1,110 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+import shapely
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+LOCATIONS_FILE = os.path.join(ROOT, 'locations.csv')
+
+# location_id -> district code lookup, rebuilt when locations.csv changes
+LOOKUP_FILE = os.path.join(ROOT, 'location_districts.npz')
+
+# code of locations outside every district
+UNKNOWN = -1
+
+# points outside every polygon within this many degrees (roughly 5 km) go to the nearest district
+NEAREST_DISTANCE = 0.05
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def spatial_join(latitudes, longitudes, max_distance=NEAREST_DISTANCE):
+    # index of the district polygon of every point, points on no polygon (e.g. just across the border)
+    # take the nearest district within max_distance and stay UNKNOWN further away
+    # the polygons (and geopandas) are only loaded when points have to be joined
+    from district_geometry import load_districts
+    districts = load_districts(tolerance=0).geometry.values
+    points = shapely.points(np.asarray(longitudes, dtype='float64'), np.asarray(latitudes, dtype='float64'))
+    codes = np.full(len(points), UNKNOWN, dtype='int16')
+    # the tree is built over the points and queried with the districts, so each of the few large
+    # polygons is prepared once instead of testing every point against raw polygons
+    district_index, point_index = shapely.STRtree(points).query(districts, predicate='intersects')
+    # a point on a shared border intersects two districts, the first one is kept
+    codes[point_index[::-1]] = district_index[::-1]
+    outside = np.flatnonzero(codes == UNKNOWN)
+    if len(outside) and max_distance:
+        point_index, district_index = shapely.STRtree(districts).query_nearest(
+            points[outside], max_distance=max_distance, return_distance=False)
+        codes[outside[point_index]] = district_index
+    return codes
+
+
+def build_lookup(locations):
+    # lookup array indexed by location_id holding the district code, and the district names
+    from district_geometry import load_districts
+    districts = load_districts(tolerance=0)
+    ids = locations['id'].to_numpy().astype('int64')
+    codes = np.full(ids.max() + 1, UNKNOWN, dtype='int16')
+    codes[ids] = spatial_join(locations['latitude'], locations['longitude'])
+    names = districts['district'].to_numpy().astype(str)
+    return codes, names
+
+
+def save_lookup(codes, names, path=LOOKUP_FILE):
+    np.savez(path + '.tmp.npz', codes=codes, names=names)
+    os.replace(path + '.tmp.npz', path)
+    return path
+
+
+def load_lookup(locations_file=LOCATIONS_FILE, path=LOOKUP_FILE):
+    # (codes, names), read from the saved lookup unless locations.csv changed since it was built
+    version = os.stat(locations_file).st_mtime_ns
+    with _lock:
+        cached = _cache.get(locations_file)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        if os.path.exists(path) and os.stat(path).st_mtime_ns >= version:
+            with np.load(path) as saved:
+                lookup = saved['codes'], saved['names']
+        else:
+            lookup = build_lookup(pd.read_csv(locations_file))
+            try:
+                save_lookup(*lookup, path=path)
+            except OSError:
+                pass
+        _cache[locations_file] = (version, lookup)
+        return lookup
+
+
+def add_locations(locations, path=LOOKUP_FILE):
+    # extending the lookup with new monitoring points (id, latitude, longitude), only the new ids are joined
+    codes, names = load_lookup()
+    ids = locations['id'].to_numpy().astype('int64')
+    new = (ids >= len(codes)) | (codes.take(ids, mode='clip') == UNKNOWN)
+    if not new.any():
+        return codes, names
+    grown = np.full(max(len(codes), ids.max() + 1), UNKNOWN, dtype='int16')
+    grown[:len(codes)] = codes
+    grown[ids[new]] = spatial_join(locations['latitude'].to_numpy()[new], locations['longitude'].to_numpy()[new])
+    save_lookup(grown, names, path)
+    with _lock:
+        _cache[LOCATIONS_FILE] = (os.stat(LOCATIONS_FILE).st_mtime_ns, (grown, names))
+    return grown, names
+
+
+def district_codes(location_ids):
+    # district code of every location id with one take, UNKNOWN for ids that are not in the lookup
+    codes, _ = load_lookup()
+    location_ids = np.asarray(location_ids).astype('int64')
+    found = codes.take(location_ids, mode='clip')
+    found[(location_ids < 0) | (location_ids >= len(codes))] = UNKNOWN
+    return found
+
+
+def district_of(location_ids):
+    # district name of every location id as a categorical, missing for unknown ids
+    _, names = load_lookup()
+    return pd.Categorical.from_codes(district_codes(location_ids), categories=names)
@@ -0,0 +1,41 @@
+from district_geometry import boundary_geojson, colored_feature_collection
+
+
+# initial map position (average coordinates of Punjab region)
+CENTER = [30.9709, 72.4826]
+
+
+def style_function(feature):
+    # the fill color travels with each feature, so one style function serves every district
+    color = feature['properties']['color']
+    return {
+        'fillColor': color,
+        'weight': 2,  # Increase border thickness
+        'color': color,
+        'fillOpacity': 0.7,  # Increase fill opacity
+        'opacity': 1,
+    }
+
+
+def create_colored_map(locations_colors, geometry=None):
+    # one choropleth layer for all districts, locations_colors maps shapefile name -> color
+    # the AQI, ranking and pollutant maps only differ in the colors passed in.
+    # geometry ({'districts': features, 'boundary': geojson}) comes from the map snapshots, without it
+    # the shapefiles are read. folium is imported by the first map drawn, not by the dashboard imports
+    import folium
+    m = folium.Map(location=CENTER, zoom_start=7)
+    if geometry is None:
+        geometry = {'districts': None, 'boundary': boundary_geojson()}
+
+    # adding a general map boundary
+    folium.GeoJson(data=geometry['boundary'], name='My Shapefile').add_to(m)
+
+    folium.GeoJson(
+        data=colored_feature_collection(locations_colors, features=geometry['districts']),
+        name='Districts',
+        style_function=style_function,
+        tooltip=folium.GeoJsonTooltip(fields=['district'], aliases=['District:']),
+        overlay=True
+    ).add_to(m)
+
+    return m
@@ -0,0 +1,170 @@
+import gzip
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from forecast_store import FORECAST_FILE, forecast_version
+from rollups import load_rollup
+from color_scale import AQI_NAME_SCALE, RANKING_COLORS, color_mapping, pollutant_scale
+
+
+# maps pre-rendered for every hour of a published forecast: the AQI map, the AQI ranking map and
+# one map per pollutant
+VIEWS = ('aqi', 'ranking') + tuple(color_mapping)
+
+# the snapshots of a forecast version live in their own directory, CURRENT names the one in use
+CURRENT_FILE = 'CURRENT'
+GEOMETRY_FILE = 'geometry.json.gz'
+
+WORKERS = min(8, os.cpu_count() or 1)
+
+# snapshot geometry keyed by directory, loaded once per process
+_geometry = {}
+_lock = threading.Lock()
+
+
+def snapshot_root(path=FORECAST_FILE):
+    # forecasted_pollutant.csv -> forecasted_pollutant_maps/
+    return os.path.splitext(path)[0] + '_maps'
+
+
+def hour_file(date_hour):
+    # '2024-06-01 05:00:00' -> 2024-06-01T05.json.gz
+    return pd.Timestamp(date_hour).strftime('%Y-%m-%dT%H') + '.json.gz'
+
+
+def view_colors(view, values, names):
+    # {shapefile name: color} of one view, values are the district means of an hour indexed by District
+    # and names the shapefile names the map can draw
+    if view == 'aqi':
+        colors = AQI_NAME_SCALE.classify(values['Aqi'])
+    elif view == 'ranking':
+        # districts from the cleanest to the most polluted, one palette step each
+        ranked = values.sort_values(by='Aqi', ascending=True)
+        colors = pd.Series(RANKING_COLORS[:len(ranked)], index=ranked.index)
+    else:
+        colors = pollutant_scale(view).classify(values[view])
+    names = set(names)
+    colors = {district.replace(' ', '_'): color for district, color in colors.items()}
+    return {name: color for name, color in colors.items() if name in names}
+
+
+def _write_json(path, data):
+    with gzip.open(path + '.tmp', 'wt') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(path + '.tmp', path)
+
+
+def _read_json(path):
+    with gzip.open(path, 'rt') as f:
+        return json.load(f)
+
+
+def _render_hours(path, directory, hours, names):
+    # worker: the colors of every view for a chunk of hours, one file per hour
+    hourly = load_rollup('hourly_mean', path)
+    for hour in hours:
+        values = hourly.xs(hour, level='date')
+        _write_json(os.path.join(directory, hour_file(hour)), {view: view_colors(view, values, names) for view in VIEWS})
+    return len(hours)
+
+
+def render_snapshots(path=FORECAST_FILE, workers=WORKERS):
+    # rendering the maps of every hour of the published forecast, run after its rollups are exported.
+    # the district geometry is stored once per version and every hour only holds the colors, so a page
+    # reads a few kilobytes instead of coloring the districts itself
+    from district_geometry import boundary_geojson, district_features
+    version = forecast_version(path)
+    root = snapshot_root(path)
+    stamp = str(version[1])
+    directory = os.path.join(root, stamp)
+    os.makedirs(directory, exist_ok=True)
+
+    features = district_features()
+    _write_json(os.path.join(directory, GEOMETRY_FILE), {'districts': features, 'boundary': boundary_geojson()})
+
+    names = list(features)
+    hours = list(load_rollup('hourly_mean', path).index.get_level_values('date').unique())
+    chunks = [list(chunk) for chunk in np.array_split(np.array(hours, dtype=object), max(1, min(workers, len(hours)))) if len(chunk)]
+    if workers <= 1:
+        rendered = sum(_render_hours(path, directory, chunk, names) for chunk in chunks)
+    else:
+        # spawned workers do not inherit the parent's OpenMP state
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=len(chunks), mp_context=context) as executor:
+            jobs = [executor.submit(_render_hours, path, directory, chunk, names) for chunk in chunks]
+            rendered = sum(job.result() for job in jobs)
+    if rendered != len(hours):
+        raise ValueError(f"Rendered {rendered} of {len(hours)} hours")
+
+    # switching the pages to the new snapshots, then removing the older versions
+    current = os.path.join(root, CURRENT_FILE)
+    with open(current + '.tmp', 'w') as f:
+        json.dump({'version': list(version), 'stamp': stamp}, f)
+    os.replace(current + '.tmp', current)
+    for name in os.listdir(root):
+        if name != stamp and os.path.isdir(os.path.join(root, name)):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return directory
+
+
+def current_snapshot(path=FORECAST_FILE):
+    # directory of the snapshots of the published forecast, None when they are missing or stale
+    root = snapshot_root(path)
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            current = json.load(f)
+        version = forecast_version(path)
+    except (OSError, ValueError):
+        return None
+    if tuple(current['version']) != version:
+        return None
+    return os.path.join(root, current['stamp'])
+
+
+def snapshot_colors(view, date_hour, path=FORECAST_FILE, directory=None):
+    # the pre-rendered colors of a view for one hour, or None
+    if view not in VIEWS:
+        raise ValueError(f"Invalid map view: {view}")
+    directory = directory or current_snapshot(path)
+    if directory is None:
+        return None
+    try:
+        return _read_json(os.path.join(directory, hour_file(date_hour)))[view]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def snapshot_geometry(directory):
+    # district features and boundary stored with the snapshots, only the latest directory is kept
+    with _lock:
+        if directory not in _geometry:
+            geometry = _read_json(os.path.join(directory, GEOMETRY_FILE))
+            _geometry.clear()
+            _geometry[directory] = geometry
+        return _geometry[directory]
+
+
+def snapshot_map(view, date_hour, path=FORECAST_FILE):
+    # the map of a view for one hour from the snapshots, None when the hour was not rendered
+    # (the caller then colors the districts itself)
+    directory = current_snapshot(path)
+    if directory is None:
+        return None
+    colors = snapshot_colors(view, date_hour, path, directory)
+    if colors is None:
+        return None
+    try:
+        geometry = snapshot_geometry(directory)
+    except (OSError, ValueError):
+        return None
+    from map_render import create_colored_map
+    return create_colored_map(colors, geometry)
+
+
+if __name__ == '__main__':
+    print(f'Saved {render_snapshots()}')
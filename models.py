@@ -0,0 +1,67 @@
+import torch
+import torch.nn as nn
+
+
+# shape of the pollutant models, 300 hours of 300 locations in and the next hour of the 300 locations out
+INPUT_SIZE = 300
+HIDDEN_SIZE = 50
+NUM_LAYERS = 2
+OUTPUT_SIZE = 300
+LOOKBACK = 300
+
+
+class CNN_LSTM(nn.Module):
+    def __init__(self, input_size=INPUT_SIZE, hidden_size=HIDDEN_SIZE, num_layers=NUM_LAYERS, output_size=OUTPUT_SIZE):
+        super(CNN_LSTM, self).__init__()
+
+        # CNN layers
+        self.conv1 = nn.Conv1d(in_channels=input_size, out_channels=64, kernel_size=3, padding=1)
+        self.conv2 = nn.Conv1d(in_channels=64, out_channels=128, kernel_size=3, padding=1)
+        self.relu = nn.ReLU()
+        self.pool = nn.MaxPool1d(kernel_size=2)
+        self.dropout = nn.Dropout(0.5)
+
+        # LSTM layers
+        self.lstm = nn.LSTM(128, hidden_size, num_layers, batch_first=True)
+
+        # Fully connected layers
+        self.fc1 = nn.Linear(hidden_size, 64)
+        self.fc2 = nn.Linear(64, output_size)
+
+    def forward(self, x):
+        # Initial input shape: (batch_size, 300, 300)
+        x = x.permute(0, 2, 1)  # Change shape to (batch_size, 300, 300) for CNN
+        x = self.conv1(x)  # Output shape: (batch_size, 64, 300)
+        x = self.relu(x)
+        x = self.pool(x)  # Output shape: (batch_size, 64, 150)
+
+        x = self.conv2(x)  # Output shape: (batch_size, 128, 150)
+        x = self.relu(x)
+        x = self.pool(x)  # Output shape: (batch_size, 128, 75)
+        x = x.permute(0, 2, 1)  # Change shape back to (batch_size, 75, 128) for LSTM
+
+        # LSTM forward
+        h0 = torch.zeros(self.lstm.num_layers, x.size(0), self.lstm.hidden_size).to(x.device)
+        c0 = torch.zeros(self.lstm.num_layers, x.size(0), self.lstm.hidden_size).to(x.device)
+        out, _ = self.lstm(x, (h0, c0))  # Output shape: (batch_size, 75, hidden_size)
+
+        # Fully connected layers
+        out = self.fc1(out[:, -1, :])  # Use the last time step's output for prediction, shape: (batch_size, hidden_size)
+        out = self.relu(out)
+        out = self.fc2(out)  # Final output shape: (batch_size, output_size) = (batch_size, 300)
+        return out
+
+
+# the notebooks declared one identical class per pollutant, the names are kept so their
+# checkpoints and code keep working
+PM10_CNN_LSTM = CNN_LSTM
+PM25_CNN_LSTM = CNN_LSTM
+carbon_monoxide_CNN_LSTM = CNN_LSTM
+nitrogen_dioxide_CNN_LSTM = CNN_LSTM
+ozone_CNN_LSTM = CNN_LSTM
+sulphur_dioxide_CNN_LSTM = CNN_LSTM
+dust_CNN_LSTM = CNN_LSTM
+aqi_CNN_LSTM = CNN_LSTM
+aqi_last_30_CNN_LSTM = CNN_LSTM
+aqi_last_14_CNN_LSTM = CNN_LSTM
+aqi_last_7_CNN_LSTM = CNN_LSTM
@@ -1,11 +1,8 @@
 import streamlit as st
 from streamlit_folium import st_folium
-import folium
-from folium import plugins
-import datetime
-from datetime import date, timedelta
+from dashboard_cache import cache_stats
+from figures import figure_stats
 from utils import get_pakistan_time, prepare_map_data,plot_separate, last_year_aggregate_pollutants,  get_pollutant_values, aggregate_pollutants, range_aggregate_pollutants, create_colored_map, create_aqi_legend, daily_aggregate_pollutants, plot_aqi_histogram, display_district_color
-import geopandas as gpd
 st.set_page_config(layout="wide")
 st.title("AQI in Punjab, Pakistan")
 st.set_option('deprecation.showPyplotGlobalUse', False)
@@ -27,7 +24,7 @@ map = prepare_map_data()
 st_folium(map, width='100%', height=800)
 st.markdown("## AQI Legend")
 legend = create_aqi_legend()
-st.pyplot(legend)
+st.image(legend)
 ########################################################
 
 
@@ -61,15 +58,16 @@ result = daily_aggregate_pollutants(initial_time, district_name)
 st.dataframe(result)
 # hourly 
 result_1 = aggregate_pollutants(initial_time, district_name)
-aqi_plot = plot_aqi_histogram(result_1.iloc[:48])
+# the AQI chart covers the selected horizon, long horizons are downsampled by plot_aqi_histogram
+horizon = st.selectbox("Select a horizon (days)", [2, 7, 14, 60], key='horizon')
+aqi_plot = plot_aqi_histogram(aggregate_pollutants(initial_time, district_name, days=horizon), days=horizon)
 # creating two columns for the plots
 col1, col2 = st.columns(2)
 with col1:
-    st.markdown("### Hourly AQI for the next 2 days")
+    st.markdown(f"### Hourly AQI for the next {horizon} days")
     st.plotly_chart(aqi_plot)
 with col2:
     last_year_data = last_year_aggregate_pollutants(initial_time, district_name)
-    print(last_year_data.columns)
     st.markdown("### Last Year AQI for the same day")
     plot_separate(last_year_data, result_1 , 'Aqi', 'Aqi')
 
@@ -92,3 +90,9 @@ pollutant_name = st.selectbox("Select a pollutant", pollutant, key='pollutant')
 range_result = range_aggregate_pollutants(initial_time, district_name, pollutant_name)
 st.dataframe(range_result)
 
+# hit and miss counters of the dashboard cache, shared by every session of the server
+with st.sidebar.expander("Cache statistics"):
+    st.dataframe(cache_stats())
+# figures made by this server process and its resident memory, which should stay flat across reruns
+with st.sidebar.expander("Memory"):
+    st.json(figure_stats())
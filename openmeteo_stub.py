@@ -0,0 +1,68 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from ingestion import request_key
+
+
+# local stand-in for the Open-Meteo API that replays responses recorded with
+# ingestion.fetch(..., record_dir=...), so ingestion can run offline:
+#
+#     with ReplayServer('recordings') as server:
+#         ingestion.fetch(start_date, end_date, url=server.url)
+#
+# fixtures/openmeteo holds a small recording, replayed by benchmarks/check_ingestion.py
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        key = request_key(urlsplit(self.path).query)
+        path = os.path.join(self.server.recordings, f"{key}.json")
+        if not os.path.exists(path):
+            self.send_error(404, f"No recorded response for {self.path}")
+            return
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ReplayServer:
+    def __init__(self, recordings, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), _ReplayHandler)
+        self.httpd.recordings = recordings
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        # air-quality endpoint of the stub, passed as url= to the ingestion functions
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/air-quality"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    # python openmeteo_stub.py recordings [port]
+    server = ReplayServer(sys.argv[1], port=int(sys.argv[2]) if len(sys.argv) > 2 else 8080)
+    print(f"Replaying {sys.argv[1]} on {server.url}")
+    server.httpd.serve_forever()
@@ -0,0 +1,110 @@
+import os
+import threading
+import pandas as pd
+from forecast_store import FORECAST_FILE, SOURCES, forecast_version, load_forecast, read_window, source_path
+
+# the rollups are stored as parquet files, without pyarrow they are built in memory
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+# district level tables materialized when a forecast is published
+ROLLUPS = ('hourly_mean', 'daily_mean', 'daily_max')
+
+# loaded rollups keyed by (path, kind), each entry is (version, frame)
+_rollups = {}
+_lock = threading.Lock()
+
+
+def rollup_path(path, kind):
+    # forecasted_pollutant.csv -> forecasted_pollutant_hourly_mean.parquet
+    return os.path.splitext(path)[0] + f'_{kind}.parquet'
+
+
+def build_rollups(df):
+    # district means per hour, and district means and maxima per day, indexed by (District, date)
+    numeric = df.select_dtypes(include='number').drop(columns=['Location_id'], errors='ignore')
+    if 'District' in df.columns:
+        district = df['District'].astype(str).rename('District')
+    else:
+        # tables with only Location_id get their district from the precomputed lookup
+        from location_districts import district_of
+        district = pd.Series(district_of(df['Location_id'].to_numpy()), index=df.index, name='District').astype(str)
+    index = pd.DatetimeIndex(df.index)
+    hourly = numeric.groupby([district, index.floor('h').rename('date')]).mean()
+    daily = numeric.groupby([district, index.floor('D').rename('date')])
+    return {
+        'hourly_mean': hourly.sort_index(),
+        'daily_mean': daily.mean().sort_index(),
+        'daily_max': daily.max().sort_index(),
+    }
+
+
+def _read_source(path):
+    if path == FORECAST_FILE:
+        return load_forecast(path)
+    return read_window(path)
+
+
+def write_rollups(path):
+    # materializing the rollups of one hourly table next to it
+    written = []
+    for kind, rollup in build_rollups(_read_source(path)).items():
+        target = rollup_path(path, kind)
+        rollup.to_parquet(target + '.tmp')
+        os.replace(target + '.tmp', target)
+        written.append(target)
+    return written
+
+
+def export_rollups(paths=None):
+    # writing the rollups of every hourly table that exists in the working directory
+    written = []
+    for path in SOURCES:
+        if paths is not None and path not in paths:
+            continue
+        if os.path.exists(source_path(path)):
+            written += write_rollups(path)
+    return written
+
+
+def _is_fresh(path, kind):
+    # a rollup file is used only if it was written after the table it summarizes
+    target = rollup_path(path, kind)
+    if pyarrow is None or not os.path.exists(target):
+        return False
+    return os.stat(target).st_mtime_ns >= os.stat(source_path(path)).st_mtime_ns
+
+
+def load_rollup(kind, path=FORECAST_FILE):
+    # reading a published rollup, when it is missing or stale it is built once for this process
+    version = forecast_version(path)
+    with _lock:
+        cached = _rollups.get((path, kind))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        if _is_fresh(path, kind):
+            rollup = pd.read_parquet(rollup_path(path, kind))
+            _rollups[(path, kind)] = (version, rollup)
+        else:
+            for name, rollup in build_rollups(_read_source(path)).items():
+                _rollups[(path, name)] = (version, rollup)
+        return _rollups[(path, kind)][1]
+
+
+def district_hour(date_hour, columns, path=FORECAST_FILE):
+    # district means of a single hour, indexed by District
+    hourly = load_rollup('hourly_mean', path)
+    return hourly.xs(pd.to_datetime(date_hour), level='date')[columns].copy()
+
+
+def district_series(kind, district, initial_time=None, final_time=None, columns=None, path=FORECAST_FILE):
+    # one district's rollup between initial_time and final_time (both inclusive), indexed by date
+    rollup = load_rollup(kind, path)
+    if district not in rollup.index.levels[0]:
+        series = rollup.iloc[0:0].droplevel('District')
+    else:
+        series = rollup.xs(district, level='District').loc[initial_time:final_time]
+    return (series if columns is None else series[columns]).copy()
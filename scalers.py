@@ -0,0 +1,113 @@
+import os
+import numpy as np
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(ROOT, 'pol_models')
+SCALER_DIR = ROOT
+
+
+def params_path(scaler_name):
+    # pol_models/pm_10_scaler.npz, next to the model checkpoints
+    return os.path.join(MODEL_DIR, f'{scaler_name}_scaler.npz')
+
+
+class MinMaxParams:
+    # the fitted parameters of a MinMaxScaler without scikit-learn: transform is X * scale + min and
+    # inverse_transform is (X - min) / scale, done with the same float64 operations as sklearn so the
+    # results are bit-identical. the trailing underscore versions work in place on float32 arrays and
+    # round every operation to float32
+
+    def __init__(self, min_, scale_, feature_names=None, clip=False):
+        self.min_ = np.asarray(min_, dtype=np.float64)
+        self.scale_ = np.asarray(scale_, dtype=np.float64)
+        self.feature_names_in_ = None if feature_names is None else np.asarray(feature_names, dtype=object)
+        self.clip = bool(clip)
+        self.n_features_in_ = len(self.min_)
+        self._min32 = self.min_.astype(np.float32)
+        self._scale32 = self.scale_.astype(np.float32)
+
+    @classmethod
+    def from_sklearn(cls, scaler):
+        return cls(scaler.min_, scaler.scale_, getattr(scaler, 'feature_names_in_', None), scaler.clip)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as saved:
+            names = saved['feature_names'] if 'feature_names' in saved else None
+            return cls(saved['min'], saved['scale'], names, saved['clip'])
+
+    def save(self, path):
+        arrays = {'min': self.min_, 'scale': self.scale_, 'clip': np.bool_(self.clip)}
+        if self.feature_names_in_ is not None:
+            arrays['feature_names'] = self.feature_names_in_.astype(str)
+        np.savez(path + '.tmp.npz', **arrays)
+        os.replace(path + '.tmp.npz', path)
+        return path
+
+    def _copy(self, X):
+        # a float64 copy of X, np.array on a DataFrame can hand back its own buffer
+        X = X.to_numpy(dtype=np.float64, copy=True) if hasattr(X, 'to_numpy') else np.array(X, dtype=np.float64)
+        self._check(X)
+        return X
+
+    def _check(self, X):
+        if X.shape[-1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[-1]} features, but the scaler expects {self.n_features_in_}")
+
+    def _clip(self, X):
+        # feature_range is always (0, 1) for these scalers
+        if self.clip:
+            np.clip(X, 0, 1, out=X)
+        return X
+
+    def transform(self, X, dtype=np.float64):
+        X = self._copy(X)
+        X *= self.scale_
+        X += self.min_
+        return self._clip(X).astype(dtype, copy=False)
+
+    def inverse_transform(self, X):
+        X = self._copy(X)
+        X -= self.min_
+        X /= self.scale_
+        return X
+
+    def transform_(self, X):
+        # X is a float32 array scaled in place
+        self._check(X)
+        X *= self._scale32
+        X += self._min32
+        return self._clip(X)
+
+    def inverse_transform_(self, X):
+        self._check(X)
+        X -= self._min32
+        X /= self._scale32
+        return X
+
+
+def export_scaler(scaler_name):
+    # writing the parameters of a pickled scaler next to the models, scikit-learn is only needed here
+    import joblib
+    params = MinMaxParams.from_sklearn(joblib.load(os.path.join(SCALER_DIR, f'{scaler_name}_scaler.pkl')))
+    return params.save(params_path(scaler_name))
+
+
+def load_params(scaler_name):
+    # the saved parameters, or the pickle when they were not exported yet
+    path = params_path(scaler_name)
+    if os.path.exists(path):
+        return MinMaxParams.load(path)
+    import joblib
+    return MinMaxParams.from_sklearn(joblib.load(os.path.join(SCALER_DIR, f'{scaler_name}_scaler.pkl')))
+
+
+def export_scalers():
+    names = sorted(file[:-len('_scaler.pkl')] for file in os.listdir(SCALER_DIR) if file.endswith('_scaler.pkl'))
+    return [export_scaler(name) for name in names]
+
+
+if __name__ == '__main__':
+    for path in export_scalers():
+        print(path)
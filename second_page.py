@@ -1,12 +1,9 @@
 import streamlit as st
 from streamlit_folium import st_folium
-import folium
-from folium import plugins
-import datetime
-from datetime import date, timedelta
+from dashboard_cache import cache_stats
+from figures import figure_stats
 from utils import get_pakistan_time, prepare_map_data, get_pollutant_values, create_aqi_legend,  display_district_color
 from utils_1 import prepare_map_data_pollutant, plot_pollutant_legend, plot_aqi_for_district, forecast_plot_predicted_aqi, prepare_ranking_map
-import geopandas as gpd
 import numpy as np
 st.set_page_config(layout="wide")
 st.title("AQI in Punjab, Pakistan (page 2)")
@@ -47,12 +44,12 @@ col1, col2 = st.columns([1, 1])
 with col1:
     st.markdown("## AQI in Punjab, Pakistan")
     legend = create_aqi_legend()
-    st.pyplot(legend)
+    st.image(legend)
     
 with col2:
     st.markdown("## Pollution in Punjab")
     legend = create_aqi_legend()
-    st.pyplot(legend)
+    st.image(legend)
     
 # two new columns, one for the map, the other for Map of AQI Map of Ranking AQI table 
 col1, col2 = st.columns([1, 1])
@@ -84,7 +81,7 @@ with col2:
     # displaying the legend for the pollutant map
     st.markdown("## Legend")
     legend = plot_pollutant_legend(selected_pollutant)
-    st.pyplot(legend)
+    st.image(legend)
     
 # pollutant map
 st.markdown("### Pollutant Map")
@@ -108,4 +105,11 @@ with col1:
 with col2:
     st.markdown("### Future Forecast")
     st.markdown(f"#### {district_name}")
-    forecast_plot_predicted_aqi(district_name)
\ No newline at end of file
+    forecast_plot_predicted_aqi(district_name)
+
+# hit and miss counters of the dashboard cache, shared by every session of the server
+with st.sidebar.expander("Cache statistics"):
+    st.dataframe(cache_stats())
+# figures made by this server process and its resident memory, which should stay flat across reruns
+with st.sidebar.expander("Memory"):
+    st.json(figure_stats())
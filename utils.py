@@ -1,104 +1,84 @@
-import folium
-import geopandas as gpd
-import random
-import matplotlib.pyplot as plt
-from datetime import datetime
-from pytz import timezone
-import torch
-import torch.nn as nn
-import torch.optim as optim
 import numpy as np
 import pandas as pd
-import joblib
-from datetime import timedelta
-import os
 import streamlit as st
-import plotly.graph_objects as go
-
-# loading the data
-forecasted_df = pd.read_csv('forecasted_pollutant.csv')
-
-# getting the current date hour in pakistan
-def get_pakistan_time():
-    # getting the current date and time in Pakistan
-    now = datetime.now(timezone('Asia/Karachi'))
-    # returning it in this format '2021-09-01 00:00:00'
-    formatted_time = now.strftime('%Y-%m-%d %H:00:00')
-    return formatted_time
-
-@st.cache_data
-def get_AQI(date_hour, forecasted_df):
+from forecast_store import FORECAST_FILE, POLLUTANTS, get_hour
+from rollups import district_hour, district_series
+from district_geometry import district_names
+from map_render import create_colored_map
+from color_scale import AQI_CATEGORIES, AQI_COLORS, AQI_NAME_SCALE, AQI_RANGES, AQI_SCALE, RANKING_COLORS
+from map_snapshots import snapshot_map, view_colors
+from dashboard_cache import cached, get_pakistan_time
+from figures import pooled_figure, render_png
+from year_over_year import HISTORY_FILE, year_over_year
+
+# the dashboard only renders forecasts: the models live in inference.py, and matplotlib and plotly
+# are imported by the functions drawing with them, so a page pays for them on its first chart.
+# matplotlib figures come from figures.py and are released after every rerun
+
+
+def get_AQI(date_hour, forecasted_df=None):
+    # without a frame the hour is looked up in the shared forecast index, a frame passed in is
+    # only indexed (hashing it for a cache key would cost more than the lookup)
+    if forecasted_df is None:
+        return hour_values(date_hour, ('Aqi', 'Location_id', 'District'))
     return forecasted_df.loc[date_hour, ['Aqi', 'Location_id', 'District']]
 
-@st.cache_data
+@cached(hourly=False)
+def hour_values(date_hour, columns):
+    return get_hour(date_hour, list(columns))
+
 def replace_space_with_underscore(aqi_color_dict):
-    for key in list(aqi_color_dict.keys()):
-        if ' ' in key:
-            new_key = key.replace(' ', '_')
-            aqi_color_dict[new_key] = aqi_color_dict.pop(key)
-    return aqi_color_dict
+    # a new dict keyed by shapefile names, the input is left unchanged
+    return {key.replace(' ', '_'): value for key, value in aqi_color_dict.items()}
 
 # classifyint the AQI value with colours based on range
 
 def get_AQI_color(aqi):
-    if aqi <= 50:
-        return 'Green'
-    elif aqi <= 100:
-        return 'Yellow'
-    elif aqi <= 150:
-        return 'Orange'
-    elif aqi <= 200:
-        return 'Red'
-    elif aqi <= 300:
-        return 'Purple'
-    else:
-        return 'Maroon'
+    return AQI_NAME_SCALE.color(aqi)
 
-@st.cache_data
+@st.cache_resource
 def get_shapefiles():
-    parent_dir = os.path.dirname(os.path.abspath(__file__))
-    root_dir = os.path.join(parent_dir, 'district_by_name')
-    shapefiles = []
-    for root, dirs, files in os.walk(root_dir):
-        for file in files:
-            if file.endswith('.shp'):
-                shapefiles.append(file.split('.')[0])
-    return shapefiles
+    # names of the districts in the shared geometry cache
+    return district_names()
 
 # Function to convert AQI to color
 def aqi_to_color(aqi):
-    if aqi <= 50:
-        return '#00E400'  # Good
-    elif aqi <= 100:
-        return '#FFFF00'  # Moderate
-    elif aqi <= 150:
-        return '#FF7E00'  # Unhealthy for sensitive groups
-    elif aqi <= 200:
-        return '#FF0000'  # Unhealthy
-    elif aqi <= 300:
-        return '#8F3F97'  # Very Unhealthy
-    else:
-        return '#7E0023'  # Hazardous
+    return AQI_SCALE.color(aqi)
+
+# most bars drawn in the AQI chart, longer horizons are downsampled on the server
+MAX_POINTS = 500
 
 # Function to create the Plotly plot
 @st.cache_data
-def plot_aqi_histogram(df):
+def plot_aqi_histogram(df, days=None, max_points=MAX_POINTS):
     # Ensure the 'AQI' column exists in the DataFrame
     if 'Aqi' not in df.columns:
         raise ValueError("The DataFrame must contain an 'AQI' column.")
 
-    # Create the figure
-    fig = go.Figure()
+    # keeping the requested horizon from the first hour, a district without rows gets an empty chart
+    aqi = df['Aqi']
+    if days is not None and len(aqi):
+        aqi = aqi.loc[:aqi.index.min() + pd.Timedelta(days=days) - pd.Timedelta(hours=1)]
 
-    # Add bars to the plot
-    for i in range(len(df)):
-        fig.add_trace(go.Bar(
-            x=[df.index[i]],
-            y=[df['Aqi'].iloc[i]],
-            marker_color=aqi_to_color(df['Aqi'].iloc[i]),
-            width=1000000,  
-            showlegend=False
-        ))
+    # above the point budget consecutive hours are merged into one bar holding their maximum
+    step = max(1, -(-len(aqi) // max_points))
+    if step > 1:
+        x = aqi.index[::step]
+        y = aqi.groupby(np.arange(len(aqi)) // step).max().to_numpy()
+    else:
+        x = aqi.index
+        y = aqi.to_numpy()
+
+    import plotly.graph_objects as go
+
+    # Create the figure with a single trace, every bar gets the color of its AQI category
+    fig = go.Figure(go.Bar(
+        x=x,
+        y=y,
+        marker_color=np.asarray(AQI_SCALE.classify(y)),
+        width=1000000 * step,
+        showlegend=False
+    ))
 
     # Set layout properties
     fig.update_layout(
@@ -112,215 +92,98 @@ def plot_aqi_histogram(df):
     return fig
 
 
-# @st.cache_data
-# Function to create a colored map
-def create_colored_map(locations_colors):
-    # Calculate the centroid for the initial map position (average coordinates of Punjab region)
-    center_x = 30.9709
-    center_y = 72.4826
-
-    # Create the Folium map
-    m = folium.Map(location=[center_x, center_y], zoom_start=7)
-
-    # adding a general map boundary
-    gdf_1 = gpd.read_file('./punjabaoi/aoi_punjab.shp')
-    # Add a GeoJSON layer
-    folium.GeoJson(data=gdf_1.to_json(), name='My Shapefile').add_to(m)
-
-    # Define a style function to set the color for each location
-    def style_function(color):
-        return {
-            'fillColor': color,
-            'weight': 2,  # Increase border thickness
-            'color': color,
-            'fillOpacity': 0.7,  # Increase fill opacity
-            'opacity': 1,
-        }
-
-    # Loop through the locations and their colors
-    for location, color in locations_colors.items():
-        # Load the shapefile
-        shp_path = f'district_by_name/{location}.shp'
-        gdf = gpd.read_file(shp_path)
-        
-        # Add GeoJSON layer to the map
-        # Add GeoJSON layer to the map
-        folium.GeoJson(
-            data=gdf.to_json(),
-            name=location,
-            style_function=lambda feature, color=color: style_function(color),
-            tooltip=folium.GeoJsonTooltip(fields=['district'], aliases=['District:']),
-            overlay=True
-        ).add_to(m)
-
-    # Return the map object
-    return m
-
-
-# @st.cache_data
+@cached(kind='resource')
 def prepare_map_data():
-    #########################################################
-    # loading the forecasted data
-    forecasted_df = pd.read_csv('forecasted_pollutant.csv')
-    # replacing unnamed column with date
-    forecasted_df = forecasted_df.rename(columns={'Unnamed: 0': 'date'})
-    # setting the date column as index
-    forecasted_df = forecasted_df.set_index('date')
-    # print(forecasted_df.head())
-    ###########################################################
+    # the map rendered for this hour when the forecast was published
     date_hour = get_pakistan_time()
-    aqi_hour = get_AQI(date_hour, forecasted_df)
-    # aggregating the AQI values for each district
-    aqi_district = aqi_hour.groupby('District').mean()
-    # implementing on the aqi_hour and pollutant_values
-    aqi_district['AQI_color'] = aqi_district['Aqi'].apply(lambda x: get_AQI_color(x))
-    # getting the shapefiles
-    shapefiles = get_shapefiles()
-    # creating the aqi_color_dict
-    aqi_color_dict = aqi_district['AQI_color'].to_dict()
-    # fixing possible space issue   
-    aqi_color_dict = replace_space_with_underscore(aqi_color_dict)
-    # filtering aqi_color_dict based on the shapefiles
-    aqi_color_dict_ = {k: v for k, v in aqi_color_dict.items() if k in shapefiles}
+    map_object = snapshot_map('aqi', date_hour)
+    if map_object is not None:
+        return map_object
+    #########################################################
+    # without a snapshot the districts are colored from the precomputed rollup
+    aqi_district = district_hour(date_hour, ['Aqi'])
+    # AQI color of every district, keyed by shapefile name
+    aqi_color_dict = view_colors('aqi', aqi_district, get_shapefiles())
     ##############################################################
-    # getting the current time in pakistan
-    # current_time = get_pakistan_time()
     # Create the map with the sample data
-    map_object = create_colored_map(aqi_color_dict_)
+    map_object = create_colored_map(aqi_color_dict)
     return map_object
 
+@cached(hourly=False)
 def get_pollutant_values(date_hour):
-    # loading the forecasted data
-    forecasted_df = pd.read_csv('forecasted_pollutant.csv')
-    # replacing unnamed column with date
-    forecasted_df = forecasted_df.rename(columns={'Unnamed: 0': 'date'})
-    # setting the date column as index
-    forecasted_df = forecasted_df.set_index('date')
-    pollutant_values = forecasted_df.loc[date_hour, ['Aqi', 'Carbon_monoxide', 'District', 'Dust',
-       'Nitrogen_dioxide', 'Ozone', 'Pm_10', 'Pm_25', 'Sulphur_dioxide']]
-    pollutant_values_agg = pollutant_values.groupby('District').mean()
+    # reading the district means of the hour from the precomputed rollup
+    pollutant_values_agg = district_hour(date_hour, POLLUTANTS)
     return pollutant_values_agg
 
 
 
 @st.cache_data
 def create_aqi_legend():
-    # Define the AQI ranges and their corresponding colors
-    aqi_categories = ['Good', 'Moderate', 'Unhealthy for sensitive groups', 'Unhealthy', 'Very Unhealthy', 'Hazardous']
-    ranges = ['0-50', '51-100', '101-150', '151-200', '201-300', '301-500']
-    colors = ['#00E400', '#FFFF00', '#FF7E00', '#FF0000', '#8F3F97', '#7E0023']
+    # AQI ranges and their corresponding colors from the shared AQI scale, rendered once to png bytes
+    aqi_categories = AQI_CATEGORIES
+    ranges = AQI_RANGES
+    colors = AQI_COLORS
+    from matplotlib.patches import Rectangle
 
     # Create the figure and axis
-    fig, ax = plt.subplots(figsize=(19, 2))
-    ax.set_xlim(0, len(aqi_categories))
-    ax.set_ylim(0, 2)
-    ax.axis('off')  # Turn off the axis
+    with pooled_figure((19, 2)) as fig:
+        ax = fig.subplots()
+        ax.set_xlim(0, len(aqi_categories))
+        ax.set_ylim(0, 2)
+        ax.axis('off')  # Turn off the axis
 
-    # Plot each AQI category with its color and name
-    for i, (category, range_, color) in enumerate(zip(aqi_categories, ranges, colors)):
-        ax.add_patch(plt.Rectangle((i, 0), 1, 1, color=color))
-        ax.text(i + 0.5, 1.5, f'{category}: {range_}', color='black', ha='center', va='center', fontsize=9)
+        # Plot each AQI category with its color and name
+        for i, (category, range_, color) in enumerate(zip(aqi_categories, ranges, colors)):
+            ax.add_patch(Rectangle((i, 0), 1, 1, color=color))
+            ax.text(i + 0.5, 1.5, f'{category}: {range_}', color='black', ha='center', va='center', fontsize=9)
 
-    return fig
+        return render_png(fig)
 
 
-@st.cache_data
-def aggregate_pollutants(initial_time, district):
-    forecasted_df = pd.read_csv('forecasted_pollutant.csv')
-    # replacing unnamed column with date
-    forecasted_df = forecasted_df.rename(columns={'Unnamed: 0': 'date'})
-    # setting the date column as index
-    forecasted_df = forecasted_df.set_index('date')
-    # converting the index to datetime
-    forecasted_df.index = pd.to_datetime(forecasted_df.index)
+@cached(hourly=False)
+def aggregate_pollutants(initial_time, district, days=30):
     # Parse the initial time
     initial_time = pd.to_datetime(initial_time)
-    final_time = initial_time + pd.Timedelta(days=30)
-
-    # Filter the DataFrame for the specified district and time range
-    filtered_df = forecasted_df[(forecasted_df.index >= initial_time) & (forecasted_df.index <= final_time) & (forecasted_df['District'] == district)]
+    final_time = initial_time + pd.Timedelta(days=days)
 
-    # Select only numeric columns for aggregation
-    numeric_columns = filtered_df.select_dtypes(include=['float64', 'int64']).columns
-
-    # Group by hour and aggregate pollutants
-    aggregated_df = filtered_df[numeric_columns].resample('H').mean()
+    # Hourly district means for the specified district and time range
+    aggregated_df = district_series('hourly_mean', district, initial_time, final_time, POLLUTANTS).asfreq('H')
     
-    return aggregated_df.drop(columns=['Location_id'])
+    return aggregated_df
 
 
-@st.cache_data
+@cached(paths=(FORECAST_FILE, HISTORY_FILE), hourly=False)
 def last_year_aggregate_pollutants(initial_time, district):
-    forecasted_df = pd.read_csv('last_year_pollutant.csv')
-    # replacing unnamed column with date
-    forecasted_df = forecasted_df.rename(columns={'Unnamed: 0': 'date'})
-    # setting the date column as index
-    forecasted_df = forecasted_df.set_index('Date')
-    # converting the index to datetime
-    forecasted_df.index = pd.to_datetime(forecasted_df.index)
     # Parse the initial time
     initial_time = pd.to_datetime(initial_time)
-    # converting initial time to last year
-    initial_time = initial_time - pd.Timedelta(days=366)
     final_time = initial_time + pd.Timedelta(days=60)
 
-    # Filter the DataFrame for the specified district and time range
-    filtered_df = forecasted_df[(forecasted_df.index >= initial_time) & (forecasted_df.index <= final_time) & (forecasted_df['District'] == district)]
-
-    # Select only numeric columns for aggregation
-    numeric_columns = filtered_df.select_dtypes(include=['float64', 'int64']).columns
-
-    # Group by hour and aggregate pollutants
-    aggregated_df = filtered_df[numeric_columns].resample('H').mean()
+    # Hourly district means of last year at the same calendar hours over the whole window,
+    # sliced from the year over year store
+    aggregated_df = year_over_year(district, initial_time, final_time, kind='history', years_back=1)
     
-    return aggregated_df.drop(columns=['Location_id'])
+    return aggregated_df
 
-@st.cache_data
+@cached(hourly=False)
 def daily_aggregate_pollutants(initial_time, district):
-    forecasted_df = pd.read_csv('forecasted_pollutant.csv')
-    # replacing unnamed column with date
-    forecasted_df = forecasted_df.rename(columns={'Unnamed: 0': 'date'})
-    # setting the date column as index
-    forecasted_df = forecasted_df.set_index('date')
-    # converting the index to datetime
-    forecasted_df.index = pd.to_datetime(forecasted_df.index)
     # Parse the initial time
     initial_time = pd.to_datetime(initial_time)
     final_time = initial_time + pd.Timedelta(days=14)
 
-    # Filter the DataFrame for the specified district and time range
-    filtered_df = forecasted_df[(forecasted_df.index >= initial_time) & (forecasted_df.index <= final_time) & (forecasted_df['District'] == district)]
-
-    # Select only numeric columns for aggregation
-    numeric_columns = filtered_df.select_dtypes(include=['float64', 'int64']).columns
-
-    # Group by daily and aggregate pollutants
-    aggregated_df = filtered_df[numeric_columns].resample('D').mean()
+    # Daily district means for the specified district, from the start of the current day
+    aggregated_df = district_series('daily_mean', district, initial_time.normalize(), final_time, POLLUTANTS).asfreq('D')
     
-    return aggregated_df.drop(columns=['Location_id'])
+    return aggregated_df
 
 
-@st.cache_data
+@cached(hourly=False)
 def range_aggregate_pollutants(initial_time, district, pollutant):
-    forecasted_df = pd.read_csv('forecasted_pollutant.csv')
-    # replacing unnamed column with date
-    forecasted_df = forecasted_df.rename(columns={'Unnamed: 0': 'date'})
-    # setting the date column as index
-    forecasted_df = forecasted_df.set_index('date')
-    # converting the index to datetime
-    forecasted_df.index = pd.to_datetime(forecasted_df.index)
     # Parse the initial time
     initial_time = pd.to_datetime(initial_time)
     final_time = initial_time + pd.Timedelta(days=14)
 
-    # Filter the DataFrame for the specified district and time range
-    filtered_df = forecasted_df[(forecasted_df.index >= initial_time) & (forecasted_df.index <= final_time) & (forecasted_df['District'] == district)]
-
-    # Select only numeric columns for aggregation
-    numeric_columns = filtered_df.select_dtypes(include=['float64', 'int64']).columns
-
-    # Group by hour and aggregate pollutants
-    aggregated_df = filtered_df[numeric_columns].resample('H').mean()
+    # Hourly district means for the specified district and time range
+    aggregated_df = district_series('hourly_mean', district, initial_time, final_time, POLLUTANTS).asfreq('H')
     
      # Calculate the AQI
     aggregated_df['Aqi'] = (
@@ -343,15 +206,8 @@ def range_aggregate_pollutants(initial_time, district, pollutant):
     return new_df
 
 
-# color paletter
-# Color palette based on the provided list
-color_palette = [
-    "#00FF00", "#19F719", "#32EF32", "#4BE74B", "#64DF64", "#7DD77D", "#96CF96", "#AFC7AF", 
-    "#C8BFC8", "#E1B7E1", "#FF9FFF", "#FF99E5", "#FF92CC", "#FF8CB2", "#FF8699", "#FF7F80", 
-    "#FF7966", "#FF734D", "#FF6C33", "#FF662A", "#FF6020", "#FF5917", "#FF5313", "#FF4C0F", 
-    "#FF460B", "#FF4007", "#FF3A03", "#FF3300", "#FF2D00", "#FF2600", "#FF2000", "#FF1A00", 
-    "#FF1400", "#FF0D00", "#FF0700", "#FF0000"
-]
+# color paletter, shared with the ranking map
+color_palette = RANKING_COLORS
 
 def display_colored_table(df):
     df_html = df.to_html(escape=False, index=False)
@@ -367,7 +223,7 @@ def display_district_color(df):
     # Convert the DataFrame to a format suitable for display in Streamlit
     df_display = df_sorted.reset_index()
     # Apply color formatting to the AQI column
-    df_display['Aqi'] = df_display.apply(lambda row: f'<div style="background-color:{row["Color"]}; color:black;">{np.round(row["Aqi"], 5)}</div)', axis=1)
+    df_display['Aqi'] = '<div style="background-color:' + df_display['Color'] + '; color:black;">' + df_display['Aqi'].astype('float64').round(5).map(str) + '</div)'
     # Apply color formatting to the district column
     # df_display['district'] = df_display.apply(lambda row: f'<div style="background-color:{row["Color"]};color:black;">{row["district"]}</div>', axis=1)
 
@@ -385,19 +241,21 @@ def plot_separate(df1, df2, y1_column, y2_column, title1="Last Year Hourly Trend
         raise ValueError("The index of df2 must be a datetime type")
 
     # Plot for last year
-    fig1, ax1 = plt.subplots(figsize=(15, 4))
-    ax1.plot(df1.index, df1[y1_column], label=y1_label, color='b')
-    ax1.set_title(title1)
-    ax1.set_xlabel('Date')
-    ax1.set_ylabel('Values')
-    ax1.legend()
-    st.pyplot(fig1)
+    with pooled_figure((15, 4)) as fig1:
+        ax1 = fig1.subplots()
+        ax1.plot(df1.index, df1[y1_column], label=y1_label, color='b')
+        ax1.set_title(title1)
+        ax1.set_xlabel('Date')
+        ax1.set_ylabel('Values')
+        ax1.legend()
+        st.pyplot(fig1)
 
     # Plot for this year
-    fig2, ax2 = plt.subplots(figsize=(15, 4))
-    ax2.plot(df2.index, df2[y2_column], label=y2_label, color='r')
-    ax2.set_title(title2)
-    ax2.set_xlabel('Date')
-    ax2.set_ylabel('Values')
-    ax2.legend()
-    st.pyplot(fig2)
+    with pooled_figure((15, 4)) as fig2:
+        ax2 = fig2.subplots()
+        ax2.plot(df2.index, df2[y2_column], label=y2_label, color='r')
+        ax2.set_title(title2)
+        ax2.set_xlabel('Date')
+        ax2.set_ylabel('Values')
+        ax2.legend()
+        st.pyplot(fig2)
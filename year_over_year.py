@@ -0,0 +1,137 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from forecast_store import FORECAST_FILE, POLLUTANTS, source_versions
+from rollups import load_rollup
+
+
+# hourly district means of the previous years, with the pm columns named as in the history files
+HISTORY_FILE = 'last_year_pollutant.csv'
+HISTORY_COLUMNS = {'Pm10': 'Pm_10', 'Pm2_5': 'Pm_25'}
+
+# prior years aligned with every forecast hour
+YEARS = 3
+
+# days past the last forecast hour kept in the store, the dashboard compares the 60 days from
+# the current hour with last year whatever the forecast covers
+WINDOW_DAYS = 60
+
+# history values and forecast minus history of every prior year, district, forecast hour and column
+# in one memory-mappable .npy file shaped (years, kinds, districts, hours, columns)
+STORE_FILE = 'year_over_year.npy'
+KINDS = ('history', 'delta')
+
+# the loaded store, kept while the versions it was built from are current
+_store = {}
+_lock = threading.Lock()
+
+
+def store_index_path(path=STORE_FILE):
+    # year_over_year.npy -> year_over_year_index.npz (districts, hours and source versions)
+    return os.path.splitext(path)[0] + '_index.npz'
+
+
+def aligned_hours(hours, years_back=1):
+    # the same calendar position years_back years earlier: month, day and hour are kept whatever
+    # leap years lie in between, 29 February is compared with 28 February of a year without it
+    return pd.DatetimeIndex(hours) - pd.DateOffset(years=years_back)
+
+
+def _district_hours(rollup, districts, hours):
+    # districts x hours x columns array of an hourly rollup, hours it does not hold are NaN
+    index = pd.MultiIndex.from_product([districts, hours], names=['District', 'date'])
+    return rollup.reindex(index).to_numpy(dtype=np.float64).reshape(len(districts), len(hours), -1)
+
+
+def build_store(path=FORECAST_FILE, history=HISTORY_FILE, years=YEARS):
+    # (store, districts, hours) from the first forecast hour to WINDOW_DAYS past the last one,
+    # the delta of hours the forecast does not cover is NaN
+    forecast = load_rollup('hourly_mean', path).reindex(columns=POLLUTANTS)
+    past = load_rollup('hourly_mean', history).rename(columns=HISTORY_COLUMNS).reindex(columns=POLLUTANTS)
+    districts = pd.Index(sorted(forecast.index.get_level_values('District').unique()), name='District')
+    dates = forecast.index.get_level_values('date')
+    hours = pd.date_range(dates.min(), dates.max() + pd.Timedelta(days=WINDOW_DAYS), freq='h', name='date')
+
+    now = _district_hours(forecast, districts, hours)
+    store = np.empty((years, len(KINDS), len(districts), len(hours), len(POLLUTANTS)), dtype=np.float32)
+    for year in range(years):
+        before = _district_hours(past, districts, aligned_hours(hours, year + 1))
+        store[year, KINDS.index('history')] = before
+        store[year, KINDS.index('delta')] = now - before
+    return store, districts, hours
+
+
+def write_store(path=STORE_FILE, forecast=FORECAST_FILE, history=HISTORY_FILE, years=YEARS):
+    # building the store when a forecast is published, the versions of both tables are stored with it
+    versions = source_versions([forecast, history])
+    store, districts, hours = build_store(forecast, history, years)
+    np.save(path + '.tmp.npy', store)
+    np.savez(store_index_path(path) + '.tmp.npz', districts=districts.to_numpy(dtype=str), hours=hours.values,
+             versions=versions, window_days=WINDOW_DAYS)
+    os.replace(path + '.tmp.npy', path)
+    os.replace(store_index_path(path) + '.tmp.npz', store_index_path(path))
+    return path
+
+
+def _read_store(path, versions, years):
+    # the stored arrays when they were built from the current tables, otherwise None
+    try:
+        with np.load(store_index_path(path)) as index:
+            # a store of an older layout holds only the forecast hours
+            if not np.array_equal(index['versions'], versions) or index['window_days'] != WINDOW_DAYS:
+                return None
+            districts = pd.Index(index['districts'].astype(object), name='District')
+            hours = pd.DatetimeIndex(index['hours'], name='date')
+        store = np.load(path, mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        return None
+    if len(store) < years:
+        return None
+    return store, districts, hours
+
+
+def load_store(path=STORE_FILE, forecast=FORECAST_FILE, history=HISTORY_FILE, years=YEARS):
+    # (store, districts, hours) with the store memory-mapped, a missing or stale store is rebuilt once
+    versions = source_versions([forecast, history])
+    key = (path, forecast, history)
+    with _lock:
+        cached = _store.get(key)
+        if cached is not None and np.array_equal(cached[0], versions) and len(cached[1][0]) >= years:
+            return cached[1]
+        loaded = _read_store(path, versions, years)
+        if loaded is None:
+            try:
+                write_store(path, forecast, history, max(years, YEARS))
+                loaded = _read_store(path, versions, years)
+            except OSError:
+                loaded = None
+            if loaded is None:
+                # a read-only working directory keeps the store in memory
+                loaded = build_store(forecast, history, max(years, YEARS))
+        _store[key] = (versions, loaded)
+        return loaded
+
+
+def year_over_year(district, start=None, end=None, kind='history', years_back=1, columns=None, path=STORE_FILE):
+    # one district's history or delta between the store hours start and end (both inclusive).
+    # the history is indexed by the aligned hours of that year, the delta by the forecast hours
+    if kind not in KINDS:
+        raise ValueError(f"Invalid year over year kind: {kind}")
+    if years_back < 1:
+        raise ValueError(f"years_back must be at least 1, got {years_back}")
+    store, districts, hours = load_store(path, years=years_back)
+    first = 0 if start is None else hours.searchsorted(pd.Timestamp(start))
+    last = len(hours) if end is None else hours.searchsorted(pd.Timestamp(end), side='right')
+    window = hours[first:last]
+    index = aligned_hours(window, years_back).rename('date') if kind == 'history' else window
+    if district not in districts:
+        frame = pd.DataFrame(np.empty((0, len(POLLUTANTS)), dtype=np.float32), columns=POLLUTANTS, index=index[0:0])
+    else:
+        values = store[years_back - 1, KINDS.index(kind), districts.get_loc(district), first:last]
+        frame = pd.DataFrame(np.array(values), index=index, columns=POLLUTANTS)
+    return frame if columns is None else frame[columns]
+
+
+if __name__ == '__main__':
+    print(f'Saved {write_store()}')